@@ -12,6 +12,7 @@ class Algae(Cell):
     Algae species.
     """
 
+    __slots__ = ()
     image = None
     count = 0
     id = 0
@@ -23,6 +24,10 @@ class Algae(Cell):
                  identity=None, inherit=None, mutation_rate=0.5):
         Cell.__init__(self, matrix, x, y, cell_image, frames,
                       identity, inherit, mutation_rate)
+        self.rotate_image = False   #direction random each move, image fixed
+
+    def rect_size(self):
+        return self.species.image[0].get_size()
 
     def display_tag(self, display=True):
         pass
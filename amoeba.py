@@ -7,7 +7,7 @@ from __future__ import division
 import pygame
 import pygame.bufferproxy
 import numpy
-import random
+import math
 try:    #animate.c compiled
     import animate
 except:
@@ -18,11 +18,133 @@ except:
 from cell import Cell
 
 
+class Treadmill(object):
+    """
+    Stacked treadmill arrays of amoebas, for batched animation.
+    Each amoeba treadmill is a view of its slot in the stack.
+    """
+
+    def __init__(self, capacity=8):
+        self.array = numpy.zeros((capacity,150,300), numpy.int_)
+        self.members = {}   #amoeba by slot
+
+    def allocate(self, amoeba):
+        "Return slot of amoeba, growing stack if full."
+        capacity = len(self.array)
+        for slot in range(capacity):
+            if slot not in self.members:
+                break
+        else:
+            array = numpy.zeros((capacity*2,150,300), numpy.int_)
+            array[:capacity] = self.array
+            self.array = array
+            for member_slot, member in self.members.items():
+                member.amoebas = self.array[member_slot]
+            slot = capacity
+        self.members[slot] = amoeba
+        self.array[slot].fill(0)
+        amoeba.amoebas = self.array[slot]
+        return slot
+
+    def release(self, slot):
+        if slot in self.members:
+            del self.members[slot]
+
+
+def amoeba_animate_batch(treadmill, slots, indices,
+                         step_x, step_y, colr):
+    """
+    Animate treadmill of amoebas in slots, as Amoeba.amoeba_animate
+    with per amoeba arrays of indices (N,25,2), step_x, step_y and colr.
+    """
+    color = colr
+    erase = 0
+    stepx = step_x - 25
+    stepy = step_y - 25
+    left = step_x - 15
+    right = step_x + 15
+    front = step_y - 15
+    color_max = color * 30
+    for change in range(25):       #generate amoeba movement
+        x = indices[:,change,0] + stepx
+        y = indices[:,change,1] + stepy
+        pt = treadmill[slots,x,y]
+        active = (pt != 0) & (pt < color_max)
+        if not active.any():
+            continue
+        slot = slots[active]
+        x = x[active]
+        y = y[active]
+        pt = pt[active]
+        colors = color[active]
+        trail = y < front[active]   #only erase trail in range
+        side_left = x < left[active]    #only erase sides in range
+        side_right = x > right[active]
+        flux = numpy.zeros(len(slot), treadmill.dtype)
+        for index_x in range(-2, 3):
+            xx = x + index_x
+            for index_y in range(0, abs(index_x)-3, -1):
+                yy = y + index_y
+                grow = pt > treadmill[slot,xx,yy]
+                if not grow.any():
+                    continue
+                treadmill[slot[grow],xx[grow],yy[grow]] += colors[grow]
+                erase_trail = grow & trail
+                treadmill[slot[erase_trail],xx[erase_trail],
+                          yy[erase_trail]+42] = erase     #erase trail
+                erase_side = grow & side_left
+                treadmill[slot[erase_side],xx[erase_side]+42,
+                          yy[erase_side]-25] = erase     #erase sides
+                treadmill[slot[erase_side],xx[erase_side]+42,
+                          yy[erase_side]+25] = erase
+                erase_side = grow & side_right
+                treadmill[slot[erase_side],xx[erase_side]-42,
+                          yy[erase_side]-25] = erase     #erase sides
+                treadmill[slot[erase_side],xx[erase_side]-42,
+                          yy[erase_side]+25] = erase
+                flux[grow] += colors[grow]
+        treadmill[slot,x,y] += flux
+    return treadmill
+
+try:
+    animate_batch = animate.amoeba_animate_batch     #compiled
+except (NameError, AttributeError):
+    animate_batch = amoeba_animate_batch
+
+
+def animate_amoebas(amoebas):
+    "Animate treadmill of amoebas in view together, then update image."
+    if not amoebas:
+        return
+    treadmill = Amoeba.treadmill
+    for step in range(max([amoeba.velocity for amoeba in amoebas])):
+        group = [amoeba for amoeba in amoebas if amoeba.velocity > step]
+        for amoeba in group:
+            amoeba.treadmill_reset()
+        slots = numpy.array([amoeba.slot for amoeba in group], numpy.int_)
+        indices = numpy.array([amoeba.amoebas_indices[
+            amoeba.amoebas_indices_keys[amoeba.amoebas_index]]
+                               for amoeba in group], numpy.int_)
+        step_x = numpy.array([amoeba.step_x for amoeba in group], numpy.int_)
+        step_y = numpy.array([amoeba.step_y for amoeba in group], numpy.int_)
+        color = numpy.array([amoeba.color for amoeba in group], numpy.int_)
+        animate_batch(treadmill.array, slots, indices,
+                      step_x, step_y, color)
+        for amoeba in group:
+            amoeba.indices_advance()
+    for amoeba in amoebas:
+        amoeba.image, amoeba.rect = amoeba.update_image()
+
+
 class Amoeba(Cell):
     """
     Amoeba species.
     """
 
+    __slots__ = ('amoeba', 'amoebas', 'amoebas_index', 'amoebas_indices',
+                 'amoebas_indices_keys', 'animate', 'color', 'slot', 'step',
+                 'step_x', 'step_y', 'image_flat', 'image_window',
+                 'image_array', 'image_full')
     image = None
     count = 0
     id = 0
@@ -43,6 +165,11 @@ class Amoeba(Cell):
                6: (150, 301),
                7: (-5, 0),
                8: (1, 6)}
+    treadmill = None    #stacked treadmill of all amoebas
+    rotation = {}   #image rotation maps by quantized direction
+    rotation_step = 2
+    image_size = 72     #rotation buffer, largest rotated amoeba extent
+    extents = {}    #rotated amoeba size by direction
     gene_info = {1: 'Distance Sense Forward[0]',
                  2: 'Distance Sense Forward[1]',
                  3: 'Distance Sense Reverse[0]',
@@ -65,14 +192,40 @@ class Amoeba(Cell):
             self.color = color * 1000 * 10
         elif color == 1000:
             self.color = 16600585   #16600585   #1000   #15000000   #color800*1000*10
+        if self.matrix.headless:   #no animation, rect defines amoeba extent
+            self.image = None
+            self.rect = pygame.Rect(0,0,50,50)
+        else:
+            self.amoeba_form()
+        self.direction = self.matrix.random.randrange(360)
+        self.rect.size = self.extent(self.direction)
+        self.rect.center = (self.x,self.y)
+        self.velocity = 2
+        self.distance = 300
+        self.reverse = False
+        self.ingest = 1
+
+    def amoeba_form(self):
         if self.species.image is None:
             self.species.screen_amoeba = pygame.Surface((50,50))
             self.species.image = self.species.screen_amoeba
-        self.amoeba = numpy.zeros((50,50), numpy.int_)
+        try:
+            self.amoeba[:] = 0      #pooled amoeba reuses arrays and surface
+            self.image_flat[:] = 0
+            recycled = True
+        except AttributeError:
+            self.amoeba = numpy.zeros((50,50), numpy.int_)
+            self.image_flat = numpy.zeros(50*50+1, numpy.int_)   #amoeba and clear pixel
+            self.image_window = self.image_flat[:50*50].reshape((50,50))
+            self.image_array = numpy.zeros((self.image_size,self.image_size),
+                                           numpy.int_)
+            recycled = False
         for x in range(10,40,2):
             for y in range(10,40,2):
                 self.amoeba[x,y] = self.color
-        self.amoebas = numpy.zeros((150,300), numpy.int_)     #amoeba move array with display overlap
+        if Amoeba.treadmill is None:
+            Amoeba.treadmill = Treadmill()
+        self.slot = Amoeba.treadmill.allocate(self)     #amoeba move array with display overlap
         self.amoebas[self.step_x-25:self.step_x+25,
                      self.step_y-25:self.step_y+25] = self.amoeba
         try:
@@ -80,39 +233,42 @@ class Amoeba(Cell):
         except NameError:
             self.animate = self.amoeba_animate
         amoebas_indices = [(x,y) for x in range(50) for y in range(50)]
-        random.shuffle(amoebas_indices)
-        self.amoebas_indices = {}
-        for i in range(100):
-            self.amoebas_indices[i] = amoebas_indices[i*25:(i*25)+25]
-        self.amoebas_indices_keys = list(self.amoebas_indices.keys())
-        random.shuffle(self.amoebas_indices_keys)
+        self.matrix.random_display.shuffle(amoebas_indices)
+        self.amoebas_indices = numpy.array(amoebas_indices,
+                                           numpy.int_).reshape((100,25,2))
+        self.amoebas_indices_keys = list(range(100))
+        self.matrix.random_display.shuffle(self.amoebas_indices_keys)
         self.amoebas_index = 0
+        if not recycled:
+            self.image_full = pygame.Surface((self.image_size,
+                                              self.image_size))
+            self.image_full.set_colorkey((0,0,0))
+        self.image = self.image_full
+        self.rect = self.image.get_rect(center=(self.x,self.y))
         for update_count in range(50):
             self.move_animate()     #initial walk to form
         self.image, self.rect = self.update_image()
-        self.direction = random.randrange(360)
-        self.velocity = 2
-        self.distance = 300
-        self.reverse = False
-        self.ingest = 1
 
     def set_trait(self, gene):
         #gene = 1:dist_sense_f-0, 2:dist_sense_f-1, 3:dist_sense_r-0, 4:dist_sense_r-1, 5:dist-0, 6:dist-1, 7:dir-0, 8:dir-1
-        trait = {'dist_sense_f': lambda: (5 * random.randrange(gene[1],gene[2])),
-                 'dist_sense_r': lambda: (5 * random.randrange(gene[3],gene[4])),
-                 'dist': lambda: random.randrange(gene[5],gene[6]),
-                 'dir': lambda: random.randrange(gene[7],gene[8])}
+        draw = self.matrix.random_draw
+        trait = {'dist_sense_f': draw.randrange(gene[1],gene[2], scale=5),
+                 'dist_sense_r': draw.randrange(gene[3],gene[4], scale=5),
+                 'dist': draw.randrange(gene[5],gene[6]),
+                 'dir': draw.randrange(gene[7],gene[8])}
         return trait
 
     def evolve(self):
         self.evolution(cycle=5000, division_threshold=5)    #evolve
 
     def display_tag(self, display=True):
+        if self.matrix.headless:
+            return
         if display:
             if not self.id_tag:
                 label_size = 10
-                self.id_tag = self.print_tag.font[label_size].render(
-                    str(self.identity), True, (255,0,0))
+                self.id_tag = self.matrix.label.render(str(self.identity),
+                                                       label_size)
             imagex, imagey = self.image.get_rect().center
             self.image.blit(self.id_tag, (imagex-3,imagey-3) )
 
@@ -136,16 +292,16 @@ class Amoeba(Cell):
         return sense
 
     def check_interact_members(self):
-        if random.random() > 0.995:
-            amoeba_bump = pygame.sprite.spritecollide(
-                self, self.matrix.cells['amoeba'], False)
+        if self.matrix.random.random() > 0.995:
+            amoeba_bump = self.matrix.creature_collide(
+                self, 'amoeba')
             if len(amoeba_bump) > 1:    #bumping more than self
                 for bump in amoeba_bump:    #if not reverse?
                     if bump == self:
                         continue
                     elif (abs(bump.rect.centerx-self.rect.centerx) < 50 and
                           abs(bump.rect.centery-self.rect.centery) < 50):
-                        self.interact = random.randrange(150,210)
+                        self.interact = self.matrix.random.randrange(150,210)
             else:
                 self.interact = 0   #not bumping
             if self.interact:
@@ -159,12 +315,10 @@ class Amoeba(Cell):
         for i in range(self.velocity):
             self.motion()
         self.check_interact_members()
-        if self.matrix.creature_inview(self):
-            for i in range(self.velocity):
-                self.move_animate()
-            self.image, self.rect = self.update_image()
-        else:
-            self.rect.center = ((self.x,self.y))
+        if self.inview:
+            self.matrix.amoeba_animation.append(self)   #animate_amoebas
+        self.rect.size = self.extent(self.direction)    #same in headless
+        self.rect.center = ((self.x,self.y))
 
     def motion(self):
         self.step += 1
@@ -178,15 +332,15 @@ class Amoeba(Cell):
                     self.x, self.y = self.locate_coordinate(
                         1, self.direction)
                     self.step = 0
-                    if self.matrix.creature_inview(self):
+                    if self.inview:
                         self.step_y -= 1    #only update animate move if onscreen
                 else:
                     self.direction = self.direction_set(
-                        self.direction + random.randrange(90,270))   #slower turn?
+                        self.direction + self.matrix.random.randrange(90,270))   #slower turn?
                     self.reverse = True
             except IndexError:
                 self.direction = self.direction_set(
-                    self.direction + random.randrange(90,270))
+                    self.direction + self.matrix.random.randrange(90,270))
                 self.reverse = True
         if self.sense():        #Sensing
             self.distance += self.trait['dist_sense_f']()   #evolve = 5 * random.randrange(0,2)
@@ -199,31 +353,45 @@ class Amoeba(Cell):
                 self.direction + dir_change)
             self.distance = self.trait['dist']()    #evolve = random.randrange(100, 200)
 
+    def life_check(self):
+        if Cell.life_check(self):
+            return True
+        else:
+            if not self.matrix.headless:
+                Amoeba.treadmill.release(self.slot)
+            return False
+
     def move_animate(self):
+        self.treadmill_reset()
+        self.amoebas = self.animate(
+            self.amoebas,
+            self.amoebas_indices[self.amoebas_indices_keys[self.amoebas_index]],
+            self.step_x, self.step_y, self.color)
+        self.indices_advance()
+
+    def treadmill_reset(self):
         if self.reverse == True:
-            self.amoeba = self.amoebas[self.step_x-25:self.step_x+25,
-                                       self.step_y-25:self.step_y+25]
-            self.amoebas = numpy.zeros((150,300), numpy.int_)
+            self.amoeba[:] = self.amoebas[self.step_x-25:self.step_x+25,
+                                          self.step_y-25:self.step_y+25]
+            self.amoebas.fill(0)    #treadmill reset in place
             self.step_y = 200   #place amoeba at beginning of treadmill
-            self.amoeba = numpy.fliplr(self.amoeba)
             self.amoebas[self.step_x-25:self.step_x+25,
-                         self.step_y-25:self.step_y+25] = self.amoeba
+                         self.step_y-25:self.step_y+25] = (
+                numpy.fliplr(self.amoeba))
             self.reverse = False
         if self.step_y < 50:    #when amoeba at end of treadmill
-            self.amoeba = self.amoebas[self.step_x-25:self.step_x+25,
-                                       self.step_y-25:self.step_y+25]
-            self.amoebas = numpy.zeros((150,300), numpy.int_)
+            self.amoeba[:] = self.amoebas[self.step_x-25:self.step_x+25,
+                                          self.step_y-25:self.step_y+25]
+            self.amoebas.fill(0)
             self.step_y = 200   #place amoeba at beginning of treadmill
             self.amoebas[self.step_x-25:self.step_x+25,
                          self.step_y-25:self.step_y+25] = self.amoeba
-        self.amoebas = self.animate(
-            self.amoebas,
-            self.amoebas_indices[self.amoebas_indices_keys[self.amoebas_index]],
-            self.step_x, self.step_y, self.color)
+
+    def indices_advance(self):
         self.amoebas_index += 1
         if self.amoebas_index > 99:
             self.amoebas_index = 0
-            random.shuffle(self.amoebas_indices_keys)
+            self.matrix.random_display.shuffle(self.amoebas_indices_keys)
 
     def amoeba_animate(self, amoebas, amoebas_indices,
                        step_x, step_y, colr):
@@ -259,27 +427,60 @@ class Amoeba(Cell):
                 amoebas[x,y] += flux
         return amoebas
 
+    def extent(self, direction):
+        "Return size of amoeba rotated by direction, as rotozoom."
+        try:
+            return self.extents[direction]
+        except KeyError:
+            size = pygame.transform.rotozoom(pygame.Surface((50,50)),
+                                             -direction, 1).get_size()
+            self.extents[direction] = size
+            return size
+
+    def rotation_map(self, direction):
+        """
+        Return index map of amoeba pixels for image rotated clockwise
+        by direction, quantized to rotation_step.
+        """
+        angle = direction - (direction % self.rotation_step)
+        if angle not in self.rotation:
+            center = (self.image_size-1) / 2.0
+            offset_x, offset_y = numpy.indices(
+                (self.image_size,self.image_size)) - center
+            sin_angle = math.sin(math.radians(angle))
+            cos_angle = math.cos(math.radians(angle))
+            x = numpy.floor(offset_x*cos_angle + offset_y*sin_angle
+                            + 25.0).astype('i')
+            y = numpy.floor(-offset_x*sin_angle + offset_y*cos_angle
+                            + 25.0).astype('i')
+            inside = (x >= 0) & (x < 50) & (y >= 0) & (y < 50)
+            self.rotation[angle] = numpy.where(inside, x*50 + y, 50*50)     #outside to clear pixel
+        return self.rotation[angle]
+
+    def image_rotate(self):
+        pass    #image formed by update_image
+
     def update_image(self):
         #update_image
-        pygame.surfarray.blit_array(
-            self.species.screen_amoeba,
-            self.amoebas[self.step_x-25:self.step_x+25,
-                         self.step_y-25:self.step_y+25])
-        image = pygame.transform.rotozoom(
-            self.species.screen_amoeba, -self.direction, 1)
-        image = image.convert()
-        image.set_colorkey((0,0,0), pygame.RLEACCEL)
-        rect = image.get_rect(center=(self.x,self.y))   #define rect position when offscreen?
-        return image, rect
+        self.image_window[:] = self.amoebas[self.step_x-25:self.step_x+25,
+                                            self.step_y-25:self.step_y+25]
+        numpy.take(self.image_flat, self.rotation_map(self.direction),
+                   out=self.image_array)
+        pygame.surfarray.blit_array(self.image_full, self.image_array)
+        width, height = self.extent(self.direction)
+        self.rect.size = (width, height)    #collision extent of rotated amoeba
+        self.rect.center = (self.x,self.y)
+        image = self.image_full.subsurface(
+            ((self.image_size-width)//2, (self.image_size-height)//2,
+             width, height))
+        return image, self.rect
 
     def growth(self):
         prey_collide = []
         prey_collide.extend(
-            pygame.sprite.spritecollide(
-                self, self.matrix.cells['bacterium'], False))
+            self.matrix.creature_collide(self, 'bacterium'))
         prey_collide.extend(
-            pygame.sprite.spritecollide(
-                self, self.matrix.cells['algae'], False))
+            self.matrix.creature_collide(self, 'algae'))
         for prey in prey_collide:
             if (abs(prey.rect.centerx - self.rect.centerx) < 15 and
                 abs(prey.rect.centery - self.rect.centery) < 15):
@@ -1,7 +1,7 @@
 """
 Amoeba Animate
 
-The amoeba_animate function is compiled with Cython and may require compiling for system dependencies, otherwise it will use Python fallback code.
+The amoeba_animate and amoeba_animate_batch functions are compiled with Cython and may require compiling for system dependencies, otherwise it will use Python fallback code.
 
 Compile for Python 2.7 on Linux 32-bit:
 cython animate.pyx
@@ -61,3 +61,44 @@ def amoeba_animate(numpy.ndarray[DTYPE_t, ndim=2] amoebas not None, amoebas_indi
             amoebas[x,y] += flux
     return amoebas
 
+
+
+@cython.boundscheck(False)
+def amoeba_animate_batch(numpy.ndarray[DTYPE_t, ndim=3] treadmill not None, numpy.ndarray[DTYPE_t, ndim=1] slots not None, numpy.ndarray[DTYPE_t, ndim=3] indices not None, numpy.ndarray[DTYPE_t, ndim=1] step_x not None, numpy.ndarray[DTYPE_t, ndim=1] step_y not None, numpy.ndarray[DTYPE_t, ndim=1] colr not None):
+    assert treadmill.dtype == DTYPE
+    cdef int i, left, right, front, change, index_x, index_y
+    cdef unsigned int s, x, y, xx, yy, stepx, stepy
+    cdef DTYPE_t flux, erase, color, color_max, pt
+    erase = 0
+    for i in range(slots.shape[0]):
+        s = <unsigned int>slots[i]
+        color = colr[i]
+        stepx = step_x[i] - 25
+        stepy = step_y[i] - 25
+        left = step_x[i] - 15
+        right = step_x[i] + 15
+        front = step_y[i] - 15
+        color_max = color * 30
+        for change in range(25):       #generate amoeba movement
+            x = <unsigned int>(indices[i,change,0] + stepx)
+            y = <unsigned int>(indices[i,change,1] + stepy)
+            pt = treadmill[s,x,y]
+            if pt and pt < color_max:
+                flux = 0
+                for index_x in range(-2, 3):
+                    xx = <unsigned int>(x + index_x)
+                    for index_y in range(0, abs(index_x)-3, -1):
+                        yy = <unsigned int>(y + index_y)
+                        if pt > treadmill[s,xx,yy]:
+                            treadmill[s,xx,yy] += color
+                            if y < front:    #only erase trail in range
+                                treadmill[s,xx,<unsigned int>(yy+42)] = erase     #erase trail
+                            if x < left:    #only erase sides in range
+                                treadmill[s,<unsigned int>(xx+42),<unsigned int>(yy-25)] = erase    #erase sides
+                                treadmill[s,<unsigned int>(xx+42),<unsigned int>(yy+25)] = erase
+                            elif x > right:
+                                treadmill[s,<unsigned int>(xx-42),<unsigned int>(yy-25)] = erase    #erase sides
+                                treadmill[s,<unsigned int>(xx-42),<unsigned int>(yy+25)] = erase
+                            flux += color
+                treadmill[s,x,y] += flux
+    return treadmill
@@ -5,7 +5,6 @@ Copyright (C) 2009 James Garnon
 
 from __future__ import division
 import math
-import random
 from cell import Cell
 
 
@@ -14,6 +13,8 @@ class Bacterium(Cell):
     Bacterium species.
     """
 
+    __slots__ = ('nutrient', 'consumption', 'max_ingest', 'sense_previous',
+                 'sense_previous_toxin', 'sense_bacteria')
     image = None
     count = 0
     id = 0
@@ -41,7 +42,9 @@ class Bacterium(Cell):
         self.velocity = 2
 
     def set_trait(self, gene):
-        trait = {'sense': lambda: random.randrange(gene[1],gene[2])}
+        draw = self.matrix.random_draw
+        trait = {'sense': draw.randrange(gene[1],gene[2]),
+                 'sense_toxin': draw.randrange(1,11)}
         return trait
 
     def evolve(self):
@@ -73,7 +76,7 @@ class Bacterium(Cell):
                             self.sense_previous_toxin):
                         self.sense_previous_toxin = self.matrix.toxin[self.x,
                                                                       self.y]
-                        return (random.randrange(1,11) * 0.02)
+                        return (self.trait['sense_toxin']() * 0.02)
                     else:
                         self.sense_previous_toxin = self.matrix.toxin[self.x,
                                                                       self.y]
@@ -84,7 +87,7 @@ class Bacterium(Cell):
             return 0.0
 
     def motor_check(self):
-        if (random.random() > ((0.1*self.velocity)
+        if (self.matrix.random_draw.random() > ((0.1*self.velocity)
                                 - (self.sense('nutrient')
                                     * self.velocity)
                                 - (self.sense('toxin')
@@ -99,13 +102,13 @@ class Bacterium(Cell):
             if self.motor_check():
                 direction = 0
             else:
-                direction = random.randrange(360)
+                direction = self.matrix.random.randrange(360)
                 self.rotate_image = True
         else:
-            if random.random() > 0.2:
+            if self.matrix.random.random() > 0.2:
                 reverse_direction = self.direction_set(
                     self.direction + 180)
-                direction = random.choice(
+                direction = self.matrix.random.choice(
                     (self.direction,reverse_direction))
             else:
                 direction = 0
@@ -135,10 +138,10 @@ class Bacterium(Cell):
             return
         if self.sensing:
             if self.sense_bacteria == 100:
-                if random.random() > 0.95:
+                if self.matrix.random.random() > 0.95:
                     self.sensing = False
         else:
-            if random.random() > 0.995:
+            if self.matrix.random.random() > 0.995:
                 self.sensing = True
         self.growth_rate = 1.0 / math.sqrt(self.sense_bacteria)  #high density causes reduce growth rate
 
@@ -153,13 +156,17 @@ class Bacterium(Cell):
                     self.consumption = self.max_ingest * self.growth_rate
                 self.ingest += self.consumption
                 if self.ingest > 100000 and not self.species.evolving:
-                    if not random.randrange(10):    #random start of fission
+                    if not self.matrix.random.randrange(10):    #random start of fission
                         self.fission = 1
                         self.ingest = 0
                         self.velocity = 1
-                self.matrix.nutrient[self.x,self.y] -= self.consumption
-                if self.matrix.nutrient[self.x,self.y] < 0:
+                level = self.matrix.nutrient[self.x,self.y] - self.consumption
+                if level > 0:
+                    self.matrix.nutrient[self.x,self.y] = level
+                else:
                     self.matrix.nutrient[self.x,self.y] = 0
+                self.matrix.field_dirty[self.x//self.matrix.field_tile,
+                                        self.y//self.matrix.field_tile] = True
             except IndexError:
                 return
         if self.cell_division():
@@ -167,7 +174,7 @@ class Bacterium(Cell):
                 self.species, self.x, self.y, clone=True,
                 inherit=self.gene.copy())
             self.velocity = 2
-            if random.random() < 0.9:
+            if self.matrix.random.random() < 0.9:
                 self.sensing = True
                 self.sense_bacteria = 1
             else:
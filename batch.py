@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+from __future__ import division
+
+"""
+Microbe - Microbial Simulation
+Copyright (C) 2009 James Garnon
+
+Batch of headless evolution runs on a process pool.
+Usage: python batch.py [options] [-- microbe options]
+"""
+
+import itertools
+import multiprocessing
+import optparse
+import os
+import sys
+import time
+import numpy
+
+import microbe
+from bacterium import Bacterium
+from paramecium import Paramecium
+from amoeba import Amoeba
+from ciliate import Ciliate
+
+
+species_class = {'bacterium': Bacterium,
+                 'paramecium': Paramecium,
+                 'amoeba': Amoeba,
+                 'ciliate': Ciliate}
+
+
+def batch_options():
+    program_usage = "%prog [options] [-- microbe options]"
+    program_desc = ("Microbe - Batch of headless evolution runs")
+    parser = optparse.OptionParser(
+        usage=program_usage,description=program_desc)
+    parser.add_option("--seeds", dest="seeds", action="store",
+                      default='1',
+                      help="--seeds 1,2,5-8 (random seed of each run)")
+    parser.add_option("-e", dest="species_evolving", action="store",
+                      default='bacterium',
+                      help="-e bacterium:paramecium,amoeba "
+                           "(species evolving, sets separated by comma)")
+    parser.add_option("-m", dest="mutation_rate", action="store",
+                      default='0.5',
+                      help="-m 0.1,0.5 (mutation rate of runs)")
+    parser.add_option("-t", dest="ticks", action="store", default='5000',
+                      help="-t value (simulation ticks of each run)")
+    parser.add_option("-g", dest="generation", action="store",
+                      default='100',
+                      help="-g value (ticks between statistics)")
+    parser.add_option("-j", dest="processes", action="store",
+                      help="-j value (processes, default cpu count)")
+    parser.add_option("-o", dest="output", action="store", default='batch',
+                      help="-o path (directory of result files)")
+    (options, args) = parser.parse_args()
+    try:
+        seeds = []
+        for seed in options.seeds.split(','):
+            if '-' in seed.strip()[1:]:
+                start, stop = seed.strip().split('-')
+                seeds.extend(range(int(start), int(stop)+1))
+            else:
+                seeds.append(int(seed))
+        evolving = [tuple(sp.strip() for sp in sps.lower().split(':'))
+                    for sps in options.species_evolving.split(',')]
+        mutation_rate = [min(max(float(rate), 0.0), 1.0)
+                         for rate in options.mutation_rate.split(',')]
+        ticks = max(int(options.ticks), 1)
+        generation = max(int(options.generation), 1)
+        if options.processes:
+            processes = max(int(options.processes), 1)
+        else:
+            processes = multiprocessing.cpu_count()
+    except ValueError:
+        parser.error("option value not valid")
+    for sps in evolving:
+        for sp in sps:
+            if sp not in species_class:
+                parser.error("species %s does not evolve" % sp)
+    return {'seeds': seeds,
+            'species_evolving': evolving,
+            'mutation_rate': mutation_rate,
+            'ticks': ticks,
+            'generation': generation,
+            'processes': processes,
+            'output': options.output,
+            'arguments': args}
+
+
+def population(matrix, species):
+    "Return fitness array and gene array (one row a creature) of species."
+    if species is Bacterium and matrix.colony:
+        n = matrix.colony.count
+        return (matrix.colony.fitness[:n].copy(),
+                matrix.colony.gene[:n].astype('d'))
+    bugs = [bug for bug in matrix.species_group[species]
+            if bug.species is species]
+    fitness = numpy.array([bug.fitness for bug in bugs], 'd')
+    gene = numpy.array([[bug.gene[genex] for genex in sorted(bug.gene)]
+                        for bug in bugs], 'd')
+    return fitness, gene
+
+
+def statistics(matrix, species, tick):
+    "Return result lines of species population fitness and genes."
+    fitness, gene = population(matrix, species)
+    lines = []
+    if not len(fitness):
+        return ['%d,%s,0,,,,,,,,' % (tick, species.__name__.lower())]
+    record = '%d,%s,%d,%.3f,%.3f,%.3f' % (tick, species.__name__.lower(),
+                                          len(fitness), fitness.mean(),
+                                          fitness.std(), fitness.max())
+    for genex in range(gene.shape[1]):
+        value = gene[:,genex]
+        lines.append('%s,%d,%.3f,%.3f,%g,%g' % (record, genex+1,
+                                                value.mean(), value.std(),
+                                                value.min(), value.max()))
+    return lines
+
+
+def run(task):
+    "Run headless matrix of task, write statistics each generation."
+    (index, seed, evolving, mutation_rate, ticks, generation,
+     arguments, output) = task
+    config = microbe.program_options(arguments)
+    config['headless'] = True
+    config['seed'] = seed
+    config['species_evolving'] = list(evolving)
+    config['mutation_rate'] = mutation_rate
+    if config['field_path']:    #memory mapped fields of each run apart
+        config['field_path'] = os.path.join(config['field_path'],
+                                            'run_%04d' % index)
+    start = time.time()
+    matrix, control = microbe.setup(config)
+    species = [species_class[sp] for sp in evolving]
+    result = open(os.path.join(output, 'run_%04d.csv' % index), 'w')
+    result.write('tick,species,count,fitness_mean,fitness_std,fitness_max,'
+                 'gene,gene_mean,gene_std,gene_min,gene_max\n')
+    tick = 0
+    while True:
+        for sp in species:
+            result.write('\n'.join(statistics(matrix, sp, tick)) + '\n')
+        result.flush()
+        if tick >= ticks:
+            break
+        tick += microbe.headless(matrix, min(generation, ticks-tick))
+    result.close()
+    matrix.trace_decay.stop()   #join decay thread before flush
+    matrix.field_flush()
+    return (index, seed, ':'.join(evolving), mutation_rate, ticks,
+            time.time()-start)
+
+
+def main():
+    options = batch_options()
+    output = options['output']
+    if not os.path.isdir(output):
+        os.makedirs(output)
+    tasks = [(index, seed, evolving, mutation_rate, options['ticks'],
+              options['generation'], options['arguments'], output)
+             for index, (seed, evolving, mutation_rate) in enumerate(
+                itertools.product(options['seeds'],
+                                  options['species_evolving'],
+                                  options['mutation_rate']))]
+    pool = multiprocessing.Pool(min(options['processes'], len(tasks)),
+                                maxtasksperchild=1)     #species class state fresh each run
+    runs = open(os.path.join(output, 'runs.csv'), 'w')
+    runs.write('run,seed,species_evolving,mutation_rate,ticks,seconds\n')
+    try:
+        for summary in pool.imap_unordered(run, tasks):
+            runs.write('%d,%d,%s,%g,%d,%.1f\n' % summary)
+            runs.flush()
+            sys.stdout.write('run %d: seed %d, evolving %s, '
+                             'mutation rate %g, %d ticks in %.1fs\n'
+                             % summary)
+        pool.close()
+    except KeyboardInterrupt:
+        pool.terminate()
+    pool.join()
+    runs.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -7,11 +7,9 @@ from __future__ import division
 import pygame
 import pygame.bufferproxy
 import math
-import random
 import os
 import pickle
-import interphase
-from util import load_image, sin_table, cos_table
+from util import load_image, get_rotation, Rotation, rotated_size, sin_table, cos_table
 from evolve import Evolve
 
 
@@ -20,7 +18,17 @@ class Cell(pygame.sprite.Sprite, Evolve):
     Cell class is the base class of cells.
     """
 
+    __slots__ = ('species', 'matrix', 'identity', 'trait', 'inherit',
+                 'x', 'y', 'pos_x', 'pos_y', 'distance', 'direction',
+                 'direction_adj_i', 'direction_adj_f', 'move_x', 'move_y',
+                 'velocity', 'reverse', 'reverse_redux', 'rotate',
+                 'rotate_count', 'interact', 'life', 'exist', 'ingest',
+                 'fitness', 'fission', 'growth_rate', 'sensing', 'rect',
+                 'rotate_image', 'image_multiframe', 'image_frame',
+                 'image_frame_counter', 'label_display', 'label_size',
+                 'id_tag', 'image_tag', 'inview')    #instance state, gene and image in class
     image = None
+    rotation = None     #pre-rotated images
     count = 0
     minimum = 10
     maximum = 100
@@ -45,7 +53,7 @@ class Cell(pygame.sprite.Sprite, Evolve):
         self.pos_x = float(self.x)     #float version
         self.pos_y = float(self.y)
         self.distance = 0       #Distance to move before changing direction, unless adjustment with sense
-        self.direction = random.randrange(360)
+        self.direction = self.matrix.random.randrange(360)
         self.direction_adj_i = 0    #fine directional adjustment
         self.direction_adj_f = 0    #full directional adjustment
         self.move_x = 1
@@ -57,6 +65,7 @@ class Cell(pygame.sprite.Sprite, Evolve):
         self.rotate_count = 0   #?
         self.interact = 0   #response taken to bumping other paramecium
         self.life = True
+        self.inview = False     #in display, set by matrix each frame
         self.exist = 0    #time since instance created
         self.ingest = 0
         self.fitness = 100
@@ -64,7 +73,8 @@ class Cell(pygame.sprite.Sprite, Evolve):
         if self.species.image is None:       #init on first class instance
             if cell_image:
                 self.species.image = []
-                image = load_image(cell_image)
+                image = load_image(cell_image,
+                                   convert=not self.matrix.headless)
                 width, height = image.get_size()
                 image_width = width // frames
                 for frame in range(frames):
@@ -72,9 +82,18 @@ class Cell(pygame.sprite.Sprite, Evolve):
                     image_frame = image.subsurface(
                         (frame_num,0), (image_width,height)).copy()
                     self.species.image.append(image_frame)
+                if not self.matrix.headless:
+                    self.species.rotation = get_rotation(
+                        cell_image, self.species.image,
+                        self.matrix.rotation_step)
             size = (self.matrix.x*self.matrix.y) / (1500*1500)
             self.species.minimum = int(math.ceil(limit[0] * size))
             self.species.maximum = int(math.ceil(limit[1] * size))
+        elif (isinstance(self.species.rotation, Rotation) and
+              self.species.rotation.step != self.matrix.rotation_step):    #set by matrix of other step
+            self.species.rotation = get_rotation(
+                self.species.rotation.name, self.species.rotation.source,
+                self.matrix.rotation_step)
         self.phenotype(self.species, cell_image, frames)     #default image
         if identity:
             self.identity = identity
@@ -83,6 +102,7 @@ class Cell(pygame.sprite.Sprite, Evolve):
         self.sensing = True     #if sensing
         self.label_display = True
         self.id_tag = None  #text id label
+        self.image_tag = None   #image with id label
         try:
             if self.species.image[0].get_size()[0] <= 10:
                 self.label_size = 6
@@ -90,8 +110,6 @@ class Cell(pygame.sprite.Sprite, Evolve):
                 self.label_size = 10
         except:
             self.label_size = 10
-        self.print_tag = interphase.Text(self.matrix.screen,
-                                         font_size=self.label_size)
         self.growth_rate = 1.0
 
     def set_trait(self, gene):
@@ -114,7 +132,14 @@ class Cell(pygame.sprite.Sprite, Evolve):
             alleles = self.species.alleles.copy()
             gene = self.genetics(inherit, mutation_rate,
                                  genome, alleles)
-        trait = self.set_trait(gene)
+        key = (self.species, tuple(sorted(gene.items())))
+        try:
+            trait = self.matrix.trait_cache[key]    #trait shared by same genotype
+        except KeyError:
+            if len(self.matrix.trait_cache) > 1000:
+                self.matrix.trait_cache.clear()
+            trait = self.set_trait(gene)
+            self.matrix.trait_cache[key] = trait
         return gene, trait
 
     def set_gene(self, gene):
@@ -126,7 +151,7 @@ class Cell(pygame.sprite.Sprite, Evolve):
 
     def phenotype(self, species, cell_image, frames):
         if cell_image:
-            self.image = species.image[0].copy()
+            self.image = species.image[0]  #display_tag blits on copy
             self.rect = self.image.get_rect(center=(self.x,self.y))
             if frames == 1:
                 self.image_multiframe = 0    #single_frame
@@ -136,17 +161,21 @@ class Cell(pygame.sprite.Sprite, Evolve):
             self.image_frame_counter = 0    #frame switch timer
 
     def display_tag(self, display=True):
+        if self.matrix.headless:
+            return
         if display:
             if not self.rotate_image:
                 if not self.id_tag:
-                    self.id_tag = self.print_tag.font[self.label_size].render(
-                        str(self.identity), True, (255,0,0))
-                imagex,imagey = self.image.get_rect().center
-                self.image.blit(self.id_tag, (imagex-3,imagey-3) )
+                    self.id_tag = self.matrix.label.render(
+                        str(self.identity), self.label_size)
+                if self.image is not self.image_tag:
+                    self.image = self.image.copy()  #keep rotation cache
+                    imagex,imagey = self.image.get_rect().center
+                    self.image.blit(self.id_tag, (imagex-3,imagey-3) )
+                    self.image_tag = self.image
         else:
-            self.image = pygame.transform.rotozoom(
-                self.species.image[self.image_frame],
-                -self.direction, 1.0)
+            self.image = self.species.rotation.image(self.image_frame,
+                                                     self.direction)
 
     def life_check(self):
         if self.life:
@@ -156,7 +185,7 @@ class Cell(pygame.sprite.Sprite, Evolve):
             return False
 
     def motion(self):
-        self.direction = random.randrange(360)
+        self.direction = self.matrix.random.randrange(360)
 
     def move(self):
         self.motion()
@@ -172,21 +201,31 @@ class Cell(pygame.sprite.Sprite, Evolve):
         self.x, self.y = self.locate_coordinate(self.velocity,
                                                 self.direction)
         self.check_interact()   #check if pass edge, adjust position accordingly
-        if self.matrix.creature_inview(self):   #image update if inview
-            if self.image_multiframe:
-                self.image_frame_counter += 1
-                if self.image_frame_counter > 2:
-                    self.image_frame_counter = 0
-                    self.image_frame += 1
-                    if self.image_frame >= self.image_multiframe:
-                        self.image_frame = 0
-                self.rotate_image = True
-            if self.rotate_image:   #rotozoom better quality than rotate
-                self.image = pygame.transform.rotozoom(
-                    self.species.image[self.image_frame],
-                    -self.direction, 1.0)
-                self.rotate_image = False
-        self.rect = self.image.get_rect(center=(self.x,self.y))
+        if self.species.image:    #rect of rotated image, same in headless
+            self.rect.size = self.rect_size()
+        self.rect.center = (self.x,self.y)
+        if self.matrix.headless:
+            return
+        if self.inview and self.image_multiframe:   #frame update if inview
+            self.image_frame_counter += 1
+            if self.image_frame_counter > 2:
+                self.image_frame_counter = 0
+                self.image_frame += 1
+                if self.image_frame >= self.image_multiframe:
+                    self.image_frame = 0
+            self.rotate_image = True
+
+    def rect_size(self):
+        "Return size of image rotated to direction."
+        return rotated_size(self.species.image[0].get_size(),
+                            self.direction, self.matrix.rotation_step)
+
+    def image_rotate(self):
+        "Set image to direction before display, size of rect."
+        if self.rotate_image:   #pre-rotated rotozoom images
+            self.image = self.species.rotation.image(self.image_frame,
+                                                     self.direction)
+            self.rotate_image = False
 
     def check_interact(self):
         self.check_edge()
@@ -0,0 +1,112 @@
+"""
+Microbe - Microbial Simulation
+Copyright (C) 2009 James Garnon
+"""
+
+from __future__ import division
+import itertools
+import math
+import numpy
+
+
+def chunk_runs(active):
+    "Return (start, stop) of each run of True in active."
+    edge = numpy.diff(numpy.concatenate(([0], active.view('b'), [0])))
+    start = numpy.nonzero(edge == 1)[0]
+    stop = numpy.nonzero(edge == -1)[0]
+    return list(zip(start.tolist(), stop.tolist()))
+
+
+class ChunkMap(object):
+    """
+    Partition of matrix into square chunks of size, a multiple of the
+    spatial grid cell. Chunks without recent bacterium trace or without
+    nutrient/toxin field are asleep, and skipped by trace decay and
+    diffusion. With lod_distance set, creatures in chunks farther than
+    lod_distance chunks from view are updated every lod_interval ticks,
+    far chunks staggered over the interval.
+    """
+
+    def __init__(self, matrix, size=250, lod_distance=None, lod_interval=4,
+                 cell_size=50):
+        self.matrix = matrix
+        self.cell_size = cell_size
+        self.size = max(int(size)//cell_size, 1) * cell_size
+        self.shape = ((matrix.x-1)//self.size+1, (matrix.y-1)//self.size+1)
+        self.trace_time = numpy.zeros(self.shape, 'l')  #tick of bacteria in chunk
+        self.trace_time -= 2**30
+        self.trace_active = numpy.zeros(self.shape, bool)   #chunks with trace
+        self.field_active = numpy.zeros(self.shape, bool)   #chunks with nutrient/toxin
+        self.lod_distance = lod_distance
+        self.lod_interval = max(int(lod_interval), 1)
+        self.due = numpy.ones(self.shape, bool)     #chunks updated this tick
+        self.phase = numpy.add.outer(numpy.arange(self.shape[0]),
+                                     numpy.arange(self.shape[1]))
+        self.phase %= self.lod_interval     #far chunk update staggered
+
+    def update(self):
+        "Update chunk activity from creature positions of tick."
+        matrix = self.matrix
+        tick = matrix.tick
+        scale = self.size // self.cell_size
+        keys = list(matrix.grid['bacterium'].buckets)
+        if keys:
+            key = numpy.array(keys, 'l') // scale
+            self.mark(self.trace_time, key[:,0], key[:,1], tick)
+        if matrix.colony and matrix.colony.count:
+            n = matrix.colony.count
+            self.mark(self.trace_time, matrix.colony.x[:n]//self.size,
+                      matrix.colony.y[:n]//self.size, tick)
+        decay = matrix.trace_decay
+        span = decay.period * (int(math.ceil(255/decay.amount)) + 2)  #ticks for trace to decay
+        numpy.greater(self.trace_time, tick-span, out=self.trace_active)
+        self.dilate(self.trace_active)  #bacteria moved across chunk edge
+        if self.lod_distance is not None:
+            self.lod_update(tick)
+
+    def mark(self, chunks, cx, cy, value):
+        numpy.clip(cx, 0, self.shape[0]-1, out=cx)
+        numpy.clip(cy, 0, self.shape[1]-1, out=cy)
+        chunks[cx,cy] = value
+
+    def dilate(self, active):
+        "Extend active chunks to neighbouring chunks, in place."
+        grown = active.copy()
+        grown[1:] |= active[:-1]
+        grown[:-1] |= active[1:]
+        grown[:,1:] |= active[:,:-1]
+        grown[:,:-1] |= active[:,1:]
+        active[...] = grown
+        return active
+
+    def field_mark(self, x1, y1, x2, y2):
+        "Mark chunks of matrix region with nutrient/toxin."
+        size = self.size
+        self.field_active[max(x1,0)//size:(min(x2,self.matrix.x)-1)//size+1,
+                          max(y1,0)//size:(min(y2,self.matrix.y)-1)//size+1] = True
+
+    def lod_update(self, tick):
+        "Set chunks due update, near view or at staggered phase."
+        matrix = self.matrix
+        size = self.size
+        distance = self.lod_distance
+        x1 = max(matrix.field_x//size - distance, 0)
+        x2 = (matrix.field_x+matrix.dx-1)//size + distance + 1
+        y1 = max(matrix.field_y//size - distance, 0)
+        y2 = (matrix.field_y+matrix.dy-1)//size + distance + 1
+        numpy.equal(self.phase, tick % self.lod_interval, out=self.due)
+        self.due[x1:x2,y1:y2] = True
+
+    def select(self, sprites):
+        "Return sprites in chunks due update."
+        if self.lod_distance is None or not sprites:
+            return sprites
+        n = len(sprites)
+        center = numpy.fromiter(
+            itertools.chain.from_iterable(
+                sprite.rect.center for sprite in sprites), 'l',
+            2*n).reshape((n,2)) // self.size
+        numpy.clip(center[:,0], 0, self.shape[0]-1, out=center[:,0])
+        numpy.clip(center[:,1], 0, self.shape[1]-1, out=center[:,1])
+        return list(itertools.compress(
+            sprites, self.due[center[:,0],center[:,1]].tolist()))
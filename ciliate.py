@@ -4,7 +4,6 @@ Copyright (C) 2009 James Garnon
 """
 
 from __future__ import division
-import random
 from paramecium import Paramecium
 
 
@@ -14,6 +13,7 @@ class Ciliate(Paramecium):
     Evolved from Paramecium.
     """
 
+    __slots__ = ()
     image = None
     count = 0
     id = 0
@@ -51,12 +51,13 @@ class Ciliate(Paramecium):
 
     def set_trait(self, gene):
         #gene = 1:vel_sense_f, 2:vel_sense_r, 3:dist_sense_f-0, 4:dist_sense_f-1, 5:dist_sense_r-0, 6:dist_sense_r-1, 7:dist-0, 8:dist-1, 9:dist_i-0, 10:dist_i-1, 11:dir_f-0, 12:dir_f-1
+        draw = self.matrix.random_draw
         trait = {'vel_sense_f': gene[1],
                  'vel_sense_r': gene[2],
-                 'dist_sense_f': lambda: (1 * random.choice((gene[3],gene[4]))),
-                 'dist_sense_r': lambda: (3 * random.choice((gene[5],gene[6]))),
-                 'dist': lambda: random.randrange(gene[7],gene[8]),
-                 'dir_i': lambda: random.randrange(gene[9],gene[10]),
-                 'dir_f': lambda: random.randrange(gene[11],gene[12])}
+                 'dist_sense_f': draw.choice((gene[3],gene[4]), scale=1),
+                 'dist_sense_r': draw.choice((gene[5],gene[6]), scale=3),
+                 'dist': draw.randrange(gene[7],gene[8]),
+                 'dir_i': draw.randrange(gene[9],gene[10]),
+                 'dir_f': draw.randrange(gene[11],gene[12])}
         return trait
 
@@ -0,0 +1,503 @@
+"""
+Microbe - Microbial Simulation
+Copyright (C) 2009 James Garnon
+"""
+
+from __future__ import division
+import pygame
+import pygame.bufferproxy
+import numpy
+import math
+from util import load_image, get_rotation, sin_table, cos_table
+from bacterium import Bacterium
+
+
+sin_array = numpy.array([sin_table[angle] for angle in range(360)])
+cos_array = numpy.array([cos_table[angle] for angle in range(360)])
+
+
+class BacteriumColony(object):
+    """
+    Bacterium population stored as arrays, with the colony advanced
+    by vectorized operations following Bacterium behaviour. Sprites are
+    only materialized for bacteria in view or when met by predators.
+    """
+
+    fields = {'pos_x': 'd',
+              'pos_y': 'd',
+              'x': 'i',
+              'y': 'i',
+              'direction': 'i',
+              'velocity': 'i',
+              'ingest': 'd',
+              'sense_previous': 'd',
+              'sense_previous_toxin': 'd',
+              'sense_bacteria': 'i',
+              'sensing': '?',
+              'growth_rate': 'd',
+              'fission': 'i',
+              'exist': 'i',
+              'fitness': 'd',
+              'life': '?',
+              'uid': 'l',
+              'identity': 'O'}
+
+    def __init__(self, matrix, cell_image='bacterium.png',
+                 limit=(90,500), capacity=1000):
+        self.matrix = matrix
+        self.species = Bacterium
+        self.count = 0
+        self.capacity = capacity
+        for field in self.fields:
+            setattr(self, field, numpy.zeros(capacity, self.fields[field]))
+        self.genome = len(self.species.gene)
+        self.gene = numpy.zeros((capacity,self.genome), 'i')
+        self.serial = 0     #uid of next bacterium
+        self.max_ingest = 10000
+        size = (self.matrix.x*self.matrix.y) / (1500*1500)
+        self.species.minimum = int(math.ceil(limit[0] * size))
+        self.species.maximum = int(math.ceil(limit[1] * size))
+        self.species.count = 0
+        image = load_image(cell_image, convert=not self.matrix.headless)
+        if not self.matrix.headless:
+            self.species.image = [image]
+            self.species.rotation = get_rotation(cell_image,
+                                                 self.species.image,
+                                                 self.matrix.rotation_step)
+        width, height = image.get_size()
+        self.size = (width, height)
+        self.extent = int(math.sqrt(width*width + height*height)//2) + 1     #rect size bound by rotation
+        self.views = {}     #materialized bacteria by uid
+        self.bucket_size = 50
+        self.bucket_rows = (self.matrix.y // self.bucket_size) + 1
+        self.bucket_keys = numpy.zeros(0, 'l')
+        self.bucket_order = numpy.zeros(0, 'l')
+
+    def reserve(self, count):
+        if count <= self.capacity:
+            return
+        capacity = max(count, self.capacity*2)
+        for field in self.fields:
+            array = numpy.zeros(capacity, self.fields[field])
+            array[:self.count] = getattr(self, field)[:self.count]
+            setattr(self, field, array)
+        gene = numpy.zeros((capacity,self.genome), 'i')
+        gene[:self.count] = self.gene[:self.count]
+        self.gene = gene
+        self.capacity = capacity
+
+    def add(self, x, y, identity=None, inherit=None):
+        """
+        Add bacteria at positions x,y, limited by species maximum.
+        Arguments identity and inherit are sequences with an entry per
+        bacterium, otherwise identity is new and gene from species.
+        Return number of bacteria added.
+        """
+        rng = self.matrix.random_array
+        number = min(len(x), self.species.maximum - self.species.count)
+        if number <= 0:
+            return 0
+        self.reserve(self.count + number)
+        new = slice(self.count, self.count+number)
+        self.x[new] = x[:number]
+        self.y[new] = y[:number]
+        self.pos_x[new] = self.x[new]
+        self.pos_y[new] = self.y[new]
+        self.direction[new] = rng.randint(0, 360, number)
+        self.velocity[new] = 2
+        self.ingest[new] = 25000     #initial reserves
+        self.sense_previous[new] = 0
+        self.sense_previous_toxin[new] = 0
+        self.sense_bacteria[new] = 1
+        self.sensing[new] = True
+        self.growth_rate[new] = 1.0
+        self.fission[new] = 0
+        self.exist[new] = 0
+        self.fitness[new] = 100
+        self.life[new] = True
+        self.uid[new] = numpy.arange(self.serial, self.serial+number)
+        self.serial += number
+        identities = range(self.species.id+1, self.species.id+number+1)
+        self.species.id += number
+        if identity is not None:
+            identities = [ident or ident_new for ident, ident_new
+                          in zip(identity[:number], identities)]
+        self.identity[new] = list(identities)
+        if inherit is not None:
+            gene = numpy.array(inherit[:number], 'i')
+        else:
+            gene = numpy.array([[self.species.gene[genex]
+                                 for genex in range(1,self.genome+1)]]
+                               * number, 'i')
+        if self.matrix.evolution and self.species.evolving:
+            gene = self.genetics(gene, inherit is not None,
+                                 self.matrix.mutation_rate)
+        self.gene[new] = gene
+        self.count += number
+        self.species.count = self.count
+        return number
+
+    def genetics(self, gene, inherit, mutation_rate=0.5):
+        """
+        Set genetics of new bacteria, as Evolve.genetics.
+        Without inherit gene set randomly from alleles, otherwise
+        gene with chance of crossover and single gene mutation.
+        """
+        rng = self.matrix.random_array
+        number = len(gene)
+        alleles = self.species.alleles
+        allele = numpy.array([[rng.randint(*alleles[genex])
+                               for genex in range(1,self.genome+1)]
+                              for i in range(number)], 'i').reshape(
+                                                    (number,self.genome))
+        if not inherit:
+            return allele
+        if self.count:
+            crossover = numpy.nonzero(rng.random_sample(number)
+                                      > 0.9)[0]
+            for i in crossover:
+                partner = rng.randint(self.count)
+                gene_select = rng.permutation(
+                    self.genome)[:self.genome//2]
+                gene[i,gene_select] = self.gene[partner,gene_select]
+        mutation = numpy.nonzero(rng.random_sample(number)
+                                 < mutation_rate)[0]
+        mutant_gene = rng.randint(0, self.genome, len(mutation))
+        gene[mutation,mutant_gene] = allele[mutation,mutant_gene]
+        return gene
+
+    def locate(self, uid):
+        "Return array index of bacterium uid, or None if removed."
+        index = numpy.searchsorted(self.uid[:self.count], uid)     #uid ascending
+        if index < self.count and self.uid[index] == uid:
+            return int(index)
+        else:
+            return None
+
+    def update(self):
+        "Advance colony a tick, as Bacterium.update of each bacterium."
+        rng = self.matrix.random_array
+        n = self.count
+        if not n:
+            return
+        matrix = self.matrix
+        x = self.x[:n]
+        y = self.y[:n]
+        direction = self.direction[:n]
+        velocity = self.velocity[:n]
+        ingest = self.ingest[:n]
+        sensing = self.sensing[:n]
+        fission = self.fission[:n]
+        gene = self.gene[:n]
+        moving = (fission == 0)
+        #sense
+        nutrient = matrix.nutrient[x,y]
+        repel = (~sensing) & (nutrient > 100)     #at high density - explore fresh pastures
+        attract = numpy.where(repel, -1.0, 1.0)
+        sensing[moving & ~repel] = True
+        sense = gene[:,0] + (rng.random_sample(n)
+                             * (gene[:,1]-gene[:,0])).astype('i')    #trait['sense']
+        sense = numpy.where(nutrient > self.sense_previous[:n],
+                            sense * 0.02 * attract, 0.0)
+        self.sense_previous[:n][moving] = nutrient[moving]
+        if matrix.toxin_presense:
+            toxin = matrix.toxin[x,y]
+            sense_toxin = rng.randint(1, 11, n) * 0.02
+            sense = sense + numpy.where(
+                toxin < self.sense_previous_toxin[:n], sense_toxin, 0.0)
+            self.sense_previous_toxin[:n][moving] = toxin[moving]
+        #motion
+        motive = (rng.random_sample(n) >
+                  (0.1*velocity) - (sense*velocity))  #1:forward 0:tumble
+        turn = numpy.array(direction)
+        tumble = moving & ~motive
+        turn[tumble] = rng.randint(0, 360, n)[tumble]
+        reverse = ((~moving) & (rng.random_sample(n) > 0.2) &
+                   (rng.random_sample(n) < 0.5))
+        turn[reverse] = (direction[reverse] + 180) % 360
+        direction[turn != 0] = turn[turn != 0]
+        #locate
+        self.pos_x[:n] += velocity * sin_array[direction]
+        self.pos_y[:n] -= velocity * cos_array[direction]
+        x[:] = self.pos_x[:n]
+        y[:] = self.pos_y[:n]
+        edge = (x < 0) | (x > matrix.x-1) | (y < 0) | (y > matrix.y-1)
+        if edge.any():
+            numpy.clip(x, 0, matrix.x-1, out=x)
+            numpy.clip(y, 0, matrix.y-1, out=y)
+            self.pos_x[:n][edge] = x[edge]
+            self.pos_y[:n][edge] = y[edge]
+        #growth
+        if self.species.count < self.species.maximum:
+            feed = numpy.nonzero(moving)[0]
+            xf = x[feed]
+            yf = y[feed]
+            nutrient = matrix.nutrient[xf,yf] * 0.01
+            consumption = (numpy.minimum(nutrient, self.max_ingest) *
+                           self.growth_rate[:n][feed])
+            ingest[feed] += consumption
+            if not self.species.evolving:
+                start = feed[(ingest[feed] > 100000) &
+                             (rng.random_sample(len(feed)) < 0.1)]   #random start of fission
+                fission[start] = 1
+                ingest[start] = 0
+                velocity[start] = 1
+            matrix.field_consume(xf, yf, numpy.ceil(consumption))
+            matrix.field_dirty[xf//matrix.field_tile,
+                               yf//matrix.field_tile] = True
+        fission[fission > 0] += 1
+        division = numpy.nonzero(fission > 500)[0]
+        if len(division):
+            fission[division] = 0
+            velocity[division] = 2
+            sensing[division] = rng.random_sample(
+                len(division)) < 0.9     #random chance to migrate
+            self.sense_bacteria[:n][division] = 1
+            birth = (x[division], y[division], None, gene[division])
+        else:
+            birth = None
+        #bacteria_detect
+        sense_bacteria = self.sense_bacteria[:n]
+        crowd = matrix.trace[x,y] > 150
+        sense_bacteria[crowd & (sense_bacteria < 100)] += 1
+        sense_bacteria[(~crowd) & (sense_bacteria > 1)] -= 1
+        chance = rng.random_sample(n)
+        sensing_stop = sensing & (sense_bacteria == 100) & (chance > 0.95)
+        sensing_start = (~sensing) & (chance > 0.995)
+        sensing[sensing_stop] = False
+        sensing[sensing_start] = True
+        self.growth_rate[:n] = 1.0 / numpy.sqrt(sense_bacteria)  #high density causes reduce growth rate
+        #bacterium_trace
+        matrix.trace[x,y] = 250
+        if birth:
+            self.add(*birth)
+        if matrix.evolution and self.species.evolving:
+            if self.species.evolving != 'pause':
+                self.evolution()
+            else:
+                for view in self.views.values():
+                    view.display_tag(False)
+                self.species.evolving = False
+        self.bucket_update()
+
+    def evolution(self, cycle=1, division_threshold=100000):
+        "Evolutionary selection, as Evolve.evolution of each bacterium."
+        rng = self.matrix.random_array
+        n = self.count
+        life = self.life[:n]
+        exist = self.exist[:n]
+        ingest = self.ingest[:n]
+        exist[life] += 1
+        ingest[life] -= 1.0/cycle  #energy expenditure
+        self.fitness[:n] = ingest/division_threshold * 100
+        fitness = self.fitness[:n]
+        cycled = life & (exist > 100)
+        exist[cycled] = 0
+        replicate = numpy.nonzero(cycled & (fitness >= 100))[0]
+        ingest[replicate] = division_threshold / 4
+        perish = numpy.nonzero(cycled & (fitness <= 0))[0]
+        perish = perish[rng.random_sample(len(perish)) >
+                        (0.9 - numpy.abs(fitness[perish]*0.1))]
+        life[perish] = False
+        cycles = int(cycled.sum())
+        if len(replicate):
+            self.add(self.x[replicate], self.y[replicate],
+                     identity=self.identity[replicate],
+                     inherit=self.gene[replicate])
+        if cycles and self.species.count < self.species.minimum:  #fresh supply to gene pool, and stop extinction
+            number = min(cycles, self.species.minimum-self.species.count)
+            self.add(rng.randint(10, self.matrix.x-10, number),
+                     rng.randint(10, self.matrix.y-10, number))
+
+    def sweep(self):
+        "Remove perished bacteria, return number removed."
+        n = self.count
+        life = self.life[:n].copy()
+        survive = int(life.sum())
+        if survive == n:
+            return 0
+        for field in self.fields:
+            array = getattr(self, field)
+            array[:survive] = array[:n][life]
+        self.gene[:survive] = self.gene[:n][life]
+        self.count = survive
+        self.species.count = survive
+        for uid in list(self.views.keys()):
+            if self.locate(uid) is None:
+                del self.views[uid]
+        return n - survive
+
+    def bucket_update(self):
+        "Sort bacteria by bucket for predator queries."
+        n = self.count
+        keys = ((self.x[:n]//self.bucket_size) * self.bucket_rows +
+                (self.y[:n]//self.bucket_size))
+        self.bucket_order = numpy.argsort(keys, kind='mergesort')
+        self.bucket_keys = keys[self.bucket_order]
+
+    def collide(self, sprite):
+        """
+        Return bacteria with rect colliding with sprite rect,
+        materialized as sprites.
+        """
+        size = self.bucket_size
+        rect = sprite.rect
+        margin = self.extent
+        y1 = max(rect.top-margin, 0) // size
+        y2 = min((rect.bottom+margin) // size, self.bucket_rows-1)
+        index = []
+        for column in range(max(rect.left-margin, 0) // size,
+                            ((rect.right+margin) // size) + 1):
+            key = column * self.bucket_rows
+            lower = numpy.searchsorted(self.bucket_keys, key+y1, 'left')
+            upper = numpy.searchsorted(self.bucket_keys, key+y2, 'right')
+            if upper > lower:
+                index.append(self.bucket_order[lower:upper])
+        if not index:
+            return []
+        index = numpy.concatenate(index)
+        x = self.x[index]
+        y = self.y[index]
+        index = index[(x+margin > rect.left) & (x-margin < rect.right) &
+                      (y+margin > rect.top) & (y-margin < rect.bottom)]
+        return [self.view(i) for i in index]
+
+    def view(self, index):
+        "Sprite of bacterium at index."
+        uid = self.uid[index]
+        if uid in self.views:
+            return self.views[uid]
+        view = BacteriumView(self, uid)
+        view.rect = pygame.Rect((0,0), self.size)
+        view.rect.center = (self.x[index], self.y[index])
+        return view
+
+    def materialize(self, left, top, right, bottom, tag=None):
+        """
+        Return sprites of bacteria within bounds, keeping views of
+        these and of bacterium tag.
+        """
+        n = self.count
+        x = self.x[:n]
+        y = self.y[:n]
+        inview = numpy.nonzero((x > left) & (x < right) &
+                               (y > top) & (y < bottom))[0]
+        views = {}
+        for i in inview:
+            uid = self.uid[i]
+            if uid in self.views:
+                view = self.views[uid]
+            else:
+                view = BacteriumView(self, uid)
+            view.refresh(i)
+            views[uid] = view
+        if tag is not None and isinstance(tag, BacteriumView):
+            if tag.uid not in views and tag.index is not None:
+                views[tag.uid] = tag
+        self.views = views
+        return [views[self.uid[i]] for i in inview]
+
+
+def colony_field(field):
+    def get(self):
+        index = self.index
+        if index is None:
+            raise AttributeError(field)
+        return getattr(self.colony, field)[index]
+    def set(self, value):
+        index = self.index
+        if index is not None:
+            getattr(self.colony, field)[index] = value
+    return property(get, set)
+
+
+class BacteriumView(pygame.sprite.Sprite):
+    """
+    Bacterium of colony materialized as sprite, with attributes
+    read from and written to colony arrays.
+    """
+
+    species = Bacterium
+    gene_info = Bacterium.gene_info
+    alleles = Bacterium.alleles
+    x = colony_field('x')
+    y = colony_field('y')
+    direction = colony_field('direction')
+    velocity = colony_field('velocity')
+    ingest = colony_field('ingest')
+    sense_bacteria = colony_field('sense_bacteria')
+    sensing = colony_field('sensing')
+    growth_rate = colony_field('growth_rate')
+    fission = colony_field('fission')
+    exist = colony_field('exist')
+    fitness = colony_field('fitness')
+    identity = colony_field('identity')
+
+    def __init__(self, colony, uid):
+        pygame.sprite.Sprite.__init__(self)
+        self.colony = colony
+        self.uid = uid
+        self.image = None
+        self.image_direction = None
+        self.rect = None
+        self.id_tag = None
+        self.image_tag = None
+        self.inview = False
+
+    @property
+    def index(self):
+        return self.colony.locate(self.uid)
+
+    def get_life(self):
+        index = self.index
+        if index is None:
+            return False
+        return bool(self.colony.life[index])
+
+    def set_life(self, value):
+        index = self.index
+        if index is not None:
+            self.colony.life[index] = value
+
+    life = property(get_life, set_life)
+
+    @property
+    def gene(self):
+        index = self.index
+        if index is None:
+            return {}
+        return dict((genex+1, int(self.colony.gene[index,genex]))
+                    for genex in range(self.colony.genome))
+
+    def set_gene(self, gene):
+        index = self.index
+        if index is not None:
+            for genex in gene:
+                self.colony.gene[index,genex-1] = gene[genex]
+
+    def refresh(self, index):
+        "Update image and rect from colony arrays."
+        direction = self.colony.direction[index]
+        if direction != self.image_direction:
+            self.image = self.species.rotation.image(0, direction)
+            self.image_direction = direction
+        self.rect = self.image.get_rect(center=(self.colony.x[index],
+                                                self.colony.y[index]))
+
+    def display_tag(self, display=True):
+        if self.colony.matrix.headless or self.image is None:
+            return
+        if display:
+            if not self.id_tag:
+                self.id_tag = self.colony.matrix.label.render(
+                    str(self.identity), 6)
+            if self.image is not self.image_tag:
+                self.image = self.image.copy()  #keep rotation cache
+                imagex,imagey = self.image.get_rect().center
+                self.image.blit(self.id_tag, (imagex-3,imagey-3) )
+                self.image_tag = self.image
+        else:
+            self.image_direction = None
+            index = self.index
+            if index is not None:
+                self.refresh(index)
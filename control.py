@@ -15,7 +15,7 @@ class Control(object):
     User control.
     """
 
-    def __init__(self, matrix):
+    def __init__(self, matrix, frame_rate=40):
         self.matrix = matrix
         self.matrix.control = self
         pygame.key.set_repeat(100,10)
@@ -62,6 +62,7 @@ class Control(object):
         self.dir = {'n':n, 's':s, 'w':w, 'e':e,
                     'nw':nw, 'ne':ne, 'sw':sw, 'se':se}
         self.clock = pygame.time.Clock()
+        self.frame_rate = frame_rate    #display refresh rate
         self.pause = False
         self.compass_folding = False
         self.fold_step = 0
@@ -433,5 +434,5 @@ class Control(object):
             self.use_tool()
         if self.pause:
             self.pause_events()
-        self.clock.tick(40)
+        self.clock.tick(self.frame_rate)
 
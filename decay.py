@@ -0,0 +1,82 @@
+"""
+Microbe - Microbial Simulation
+Copyright (C) 2009 James Garnon
+"""
+
+from __future__ import division
+import threading
+import numpy
+from chunkmap import chunk_runs
+try:
+    import queue
+except ImportError:     #python 2
+    import Queue as queue
+
+
+class TraceDecay(object):
+    """
+    Incremental decay of bacterium trace.
+    Each tick decays a band of rows, so the whole field is decayed
+    by amount every period ticks, for any field size. With chunks,
+    only chunks with trace active are decayed. Decay can run in a
+    background thread, processing ticks as they are signalled.
+    """
+
+    def __init__(self, trace, period=27, amount=10, threaded=False,
+                 chunks=None):
+        self.trace = trace
+        self.period = max(int(period), 1)
+        self.amount = amount
+        self.chunks = chunks
+        self.tick = 0   #tick of decay period
+        self.thread = None
+        if threaded:
+            self.start()
+
+    def decay(self):
+        "Decay next band of trace, in place saturating at zero."
+        rows = self.trace.shape[0]
+        row1 = self.tick*rows//self.period
+        row2 = (self.tick+1)*rows//self.period
+        self.tick += 1
+        if self.tick >= self.period:
+            self.tick = 0
+        if row1 >= row2:
+            return
+        band = self.trace[row1:row2]
+        if self.chunks is None:
+            views = [band]
+        else:
+            size = self.chunks.size
+            active = self.chunks.trace_active[row1//size:(row2-1)//size+1]
+            views = [band[:,col1*size:col2*size]
+                     for col1, col2 in chunk_runs(active.any(axis=0))]
+        for view in views:
+            numpy.maximum(view, self.amount, out=view)
+            numpy.subtract(view, self.amount, out=view)
+
+    def update(self):
+        "Decay for a tick, or signal decay thread."
+        if self.thread:
+            self.ticks.put(True)
+        else:
+            self.decay()
+
+    def start(self):
+        if self.thread:
+            return
+        self.ticks = queue.Queue()     #ticks pending decay
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        if not self.thread:
+            return
+        self.ticks.put(False)   #stop after pending ticks
+        self.thread.join()
+        self.thread = None
+
+    def run(self):
+        while self.ticks.get():
+            self.decay()
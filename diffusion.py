@@ -0,0 +1,143 @@
+"""
+Microbe - Microbial Simulation
+Copyright (C) 2009 James Garnon
+"""
+
+from __future__ import division
+import math
+import numpy
+from chunkmap import chunk_runs
+
+
+class FieldDiffusion(object):
+    """
+    Diffusion and decay of nutrient and toxin fields.
+    Run every interval ticks, diffusing by rate per tick with a
+    five point stencil in substeps that remain stable, or with an
+    FFT heat kernel that has periodic edges. Decay is the fraction
+    of field lost per tick. With matrix chunks, the stencil is applied
+    only to chunks with field and their neighbours, each run of chunks
+    widened by a halo of the substeps so the result is unchanged.
+    """
+
+    def __init__(self, matrix, rate=0.05, interval=10, decay=0.0,
+                 method='stencil'):
+        self.matrix = matrix
+        self.rate = rate
+        self.interval = max(int(interval), 1)
+        self.decay = decay
+        self.method = method
+        self.tick = 0
+        diffuse = rate * self.interval     #diffusion over interval
+        self.substeps = max(int(math.ceil(diffuse / 0.2)), 1)   #stable at <=0.25
+        self.step_rate = diffuse / self.substeps
+        self.retain = (1.0 - decay) ** self.interval
+        shape = (matrix.x, matrix.y)
+        if method == 'fft':
+            self.kernel = self.heat_kernel(shape, diffuse)
+            self.buffer = None
+            self.laplace = None
+        else:
+            self.kernel = None
+            self.buffer = matrix.field_array('diffusion_level', 'f')
+            if matrix.chunks is None:
+                self.laplace = matrix.field_array('diffusion_laplace', 'f')
+            else:
+                self.laplace = None     #laplace of each chunk window
+
+    def heat_kernel(self, shape, diffuse):
+        "Return spectral factor of discrete diffusion over time diffuse."
+        kx = numpy.cos(2 * math.pi * numpy.arange(shape[0]) / shape[0])
+        ky = numpy.cos(2 * math.pi *
+                       numpy.arange(shape[1]//2+1) / shape[1])
+        eigen = (2*kx-2)[:,numpy.newaxis] + (2*ky-2)[numpy.newaxis,:]
+        return numpy.exp(diffuse * eigen)
+
+    def update(self):
+        "Diffuse fields each interval ticks."
+        self.tick += 1
+        if self.tick < self.interval:
+            return
+        self.tick = 0
+        matrix = self.matrix
+        if matrix.chunks is None or self.method == 'fft':
+            self.diffuse(matrix.nutrient)
+            if matrix.toxin_presense:
+                self.diffuse(matrix.toxin)
+        else:
+            chunks = matrix.chunks
+            active = chunks.dilate(chunks.field_active.copy())  #chunks field may spread to
+            windows = self.windows(active, chunks.size)
+            active[...] = False
+            self.diffuse_windows(matrix.nutrient, windows, active)
+            if matrix.toxin_presense:
+                self.diffuse_windows(matrix.toxin, windows, active)
+            chunks.field_active[...] = active
+        matrix.field_dirty[:] = True   #display with field refresh
+
+    def windows(self, active, size):
+        "Return matrix regions of each run of active chunks in chunk rows."
+        windows = []
+        for cx in numpy.nonzero(active.any(axis=1))[0].tolist():
+            for cy1, cy2 in chunk_runs(active[cx]):
+                windows.append((cx*size, min((cx+1)*size, self.matrix.x),
+                                cy1*size, min(cy2*size, self.matrix.y)))
+        return windows
+
+    def diffuse_windows(self, field, windows, active):
+        "Diffuse field in windows, marking active chunks with field."
+        halo = self.substeps    #stencil reach over substeps
+        size = self.matrix.chunks.size
+        for x1, x2, y1, y2 in windows:
+            wx1 = max(x1-halo, 0)
+            wx2 = min(x2+halo, self.matrix.x)
+            wy1 = max(y1-halo, 0)
+            wy2 = min(y2+halo, self.matrix.y)
+            level = field[wx1:wx2,wy1:wy2].astype('f')
+            self.stencil(level, numpy.empty_like(level))
+            self.buffer[x1:x2,y1:y2] = level[x1-wx1:x2-wx1,y1-wy1:y2-wy1]
+        for x1, x2, y1, y2 in windows:
+            level = self.buffer[x1:x2,y1:y2]
+            self.level_set(field[x1:x2,y1:y2], level)
+            for y in range(y1, y2, size):
+                active[x1//size,y//size] |= level[:,y-y1:y-y1+size].any()
+
+    def diffuse(self, field):
+        if self.method == 'fft':
+            spectrum = numpy.fft.rfft2(field)
+            spectrum *= self.kernel
+            if self.retain != 1.0:
+                spectrum *= self.retain
+            level = numpy.fft.irfft2(spectrum, field.shape)
+            numpy.rint(level, out=level)
+            numpy.clip(level, 0, self.matrix.field_limit, out=level)
+            numpy.copyto(field, level, casting='unsafe')
+            return
+        level = self.buffer
+        numpy.copyto(level, field, casting='unsafe')
+        self.stencil(level, self.laplace)
+        self.level_set(field, level)
+
+    def stencil(self, level, laplace):
+        "Diffuse level in place over substeps, with no flux at edges."
+        for substep in range(self.substeps):
+            numpy.multiply(level, -4, out=laplace)
+            laplace[1:] += level[:-1]
+            laplace[:-1] += level[1:]
+            laplace[:,1:] += level[:,:-1]
+            laplace[:,:-1] += level[:,1:]
+            laplace[0] += level[0]      #no flux at edges
+            laplace[-1] += level[-1]
+            laplace[:,0] += level[:,0]
+            laplace[:,-1] += level[:,-1]
+            laplace *= self.step_rate
+            level += laplace
+
+    def level_set(self, field, level):
+        "Set field to level after decay, rounded and within field range."
+        if self.retain != 1.0:
+            level *= self.retain
+        numpy.rint(level, out=level)
+        if self.matrix.field_limit is not None:
+            numpy.minimum(level, self.matrix.field_limit, out=level)
+        numpy.copyto(field, level, casting='unsafe')
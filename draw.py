@@ -0,0 +1,48 @@
+"""
+Microbe - Microbial Simulation
+Copyright (C) 2009 James Garnon
+"""
+
+from __future__ import division
+import functools
+import numpy
+
+
+class RandomDraw(object):
+    """
+    Random values pre-drawn in blocks from a numpy RandomState. Streams
+    are callables returning successive values, replacing scalar random
+    calls made by creatures each tick. Block size of a stream grows
+    from block_min to block_max as it is used.
+    """
+
+    def __init__(self, source, block_min=16, block_max=1024):
+        self.source = source
+        self.block_min = block_min
+        self.block_max = block_max
+        self.random = self.stream(self.source.random_sample)   #random.random()
+
+    def stream(self, draw):
+        "Return callable giving successive values of blocks from draw(size)."
+        def values():
+            size = self.block_min
+            while True:
+                for value in draw(size).tolist():
+                    yield value
+                size = min(size*2, self.block_max)
+        return functools.partial(next, values())
+
+    def randrange(self, start, stop, scale=1):
+        "Return stream of scale*random.randrange(start,stop)."
+        source = self.source
+        if scale == 1:
+            return self.stream(lambda size: source.randint(start, stop, size))
+        return self.stream(
+            lambda size: source.randint(start, stop, size) * scale)
+
+    def choice(self, options, scale=1):
+        "Return stream of scale*random.choice(options)."
+        source = self.source
+        options = numpy.array(options) * scale
+        return self.stream(
+            lambda size: options[source.randint(0, len(options), size)])
@@ -4,7 +4,6 @@ Copyright (C) 2009 James Garnon
 """
 
 from __future__ import division
-import random
 
 
 class Evolve(object):
@@ -26,20 +25,20 @@ class Evolve(object):
         if self.matrix.evolution and genome:     #evolve trait parameters
             self.inherit = inherit
             gene = {}
-            mutation = random.random() < mutation_rate    #if inherit with mutation
+            mutation = self.matrix.random.random() < mutation_rate    #if inherit with mutation
             if not inherit or mutation:     #set genes chosen randomly from alleles
                 for genex in range(1,genome+1):
-                    gene[genex] = random.randrange(*alleles[genex])
+                    gene[genex] = self.matrix.random.randrange(*alleles[genex])
                 if mutation:
                     genes = list(gene.keys())
-                    mutant_gene = random.choice(genes)  #mutate single gene
+                    mutant_gene = self.matrix.random.choice(genes)  #mutate single gene
                     mutant_trait = {mutant_gene: gene[mutant_gene]}
             if inherit:
                 gene = inherit  #clonal division
-                if random.random() > 0.9:   #crossover
+                if self.matrix.random.random() > 0.9:   #crossover
                     group = self.matrix.species_group[self.species]
-                    gene_xo = random.choice(group.sprites()).gene
-                    gene_select = random.sample(range(1,len(gene)+1),
+                    gene_xo = self.matrix.random.choice(group.sprites()).gene
+                    gene_select = self.matrix.random.sample(range(1,len(gene)+1),
                                                 len(gene)//2)
                     for gen in gene_select:
                         gene[gen] = gene_xo[gen]
@@ -68,7 +67,7 @@ class Evolve(object):
                             identity=self.identity,
                             inherit=self.gene.copy())     #give copy of self.gene, so that it's not modified
                 elif self.fitness <= 0:   #possible decrease when reserves depleted
-                    if random.random() > (0.9 - abs(self.fitness*0.1)):
+                    if self.matrix.random.random() > (0.9 - abs(self.fitness*0.1)):
                         self.life = False
                 if self.species.count < self.species.minimum:  #fresh supply to gene pool, and stop extinction
                     self.matrix.add_creature(self.species)
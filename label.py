@@ -0,0 +1,38 @@
+"""
+Microbe - Microbial Simulation
+Copyright (C) 2009 James Garnon
+"""
+
+from __future__ import division
+import interphase
+
+
+class Label(object):
+    """
+    Identity label renderer shared by cells of matrix.
+    Labels rendered on demand, cached by text, size and colour.
+    """
+
+    def __init__(self, surface, color=(255,0,0), cache_limit=1000):
+        self.surface = surface
+        self.color = color
+        self.cache_limit = cache_limit
+        self.text = {}      #interphase.Text by font size
+        self.cache = {}     #rendered labels
+
+    def render(self, text, size=10, color=None):
+        "Return label surface, which should not be modified."
+        if color is None:
+            color = self.color
+        key = (text, size, color)
+        try:
+            return self.cache[key]
+        except KeyError:
+            pass
+        if size not in self.text:
+            self.text[size] = interphase.Text(self.surface, font_size=size)
+        if len(self.cache) >= self.cache_limit:
+            self.cache.clear()
+        label = self.text[size].font[size].render(text, True, color)
+        self.cache[key] = label
+        return label
@@ -7,14 +7,26 @@ from __future__ import division
 import pygame
 import pygame.bufferproxy
 import numpy
+import numpy.lib.format
+import math
 import random
 import os
+import tempfile
 import pickle
 from algae import Algae
 from bacterium import Bacterium
-from paramecium import Paramecium
-from amoeba import Amoeba
+from paramecium import Paramecium, ParameciumKernel
+from amoeba import Amoeba, animate_amoebas
 from ciliate import Ciliate
+from spatial import SpatialGrid
+from colony import BacteriumColony
+from util import Rotation
+from label import Label
+from render import FieldRenderer
+from decay import TraceDecay
+from diffusion import FieldDiffusion
+from chunkmap import ChunkMap
+from draw import RandomDraw
 
 
 class Matrix(object):
@@ -27,27 +39,52 @@ class Matrix(object):
         self.y = parameters['matrix_size'][1]
         self.dx = parameters['display_size'][0]     #Display dimension
         self.dy = parameters['display_size'][1]
-        pygame.display.init()
-        pygame.font.init()
-        pygame.display.set_caption('Microbe')
-        iconname = os.path.join('data', 'icon.png')
-        icon = pygame.image.load(iconname)
-        pygame.display.set_icon(icon)
-        pygame.mouse.set_visible(True)
+        self.headless = parameters.get('headless', False)   #simulation without display
+        self.seed = parameters.get('seed')   #random seed, None for unseeded
+        seeder = random.Random(self.seed)
+        self.random = random.Random(seeder.getrandbits(64))   #simulation
+        self.random_array = numpy.random.RandomState(
+            seeder.getrandbits(32))     #simulation array engines
+        self.random_display = random.Random(seeder.getrandbits(64))   #display only animation
+        self.random_draw = RandomDraw(numpy.random.RandomState(
+            seeder.getrandbits(32)))    #creature per tick draws in blocks
+        self.trait_cache = {}   #species traits by genotype
+        self.mutation_rate = parameters.get('mutation_rate', 0.5)   #evolution gene mutation
+        self.rotation_step = (parameters.get('rotation_step')
+                              or Rotation.step)   #sprite rotation resolution
         pygame.surfarray.use_arraytype('numpy')
-        if parameters['gamma']:
-            gamma_set = pygame.display.set_gamma(parameters['gamma'])
-        self.screen = pygame.display.set_mode((self.dx,self.dy))
-        if parameters['gamma'] and not gamma_set:   #if prior set_gamma failed
-            gamma_set = pygame.display.set_gamma(parameters['gamma'])
-        self.screen_toxin = pygame.display.get_surface()
-        self.screen_microbe = pygame.display.get_surface()
+        if not self.headless:
+            pygame.display.init()
+            pygame.font.init()
+            pygame.display.set_caption('Microbe')
+            iconname = os.path.join('data', 'icon.png')
+            icon = pygame.image.load(iconname)
+            pygame.display.set_icon(icon)
+            pygame.mouse.set_visible(True)
+            if parameters['gamma']:
+                gamma_set = pygame.display.set_gamma(parameters['gamma'])
+            self.screen = pygame.display.set_mode((self.dx,self.dy))
+            if parameters['gamma'] and not gamma_set:   #if prior set_gamma failed
+                gamma_set = pygame.display.set_gamma(parameters['gamma'])
+            self.screen_toxin = pygame.display.get_surface()
+            self.screen_microbe = pygame.display.get_surface()
+            self.label = Label(self.screen)     #cell identity labels
+        else:
+            self.screen = None
+            self.screen_toxin = None
+            self.screen_microbe = None
+            self.label = None
         self.cells = {}
         self.cells['algae'] = pygame.sprite.RenderUpdates()
         self.cells['bacterium'] = pygame.sprite.RenderUpdates()
         self.cells['paramecium'] = pygame.sprite.RenderUpdates()
         self.cells['amoeba'] = pygame.sprite.RenderUpdates()
         self.cells['creatures'] = pygame.sprite.OrderedUpdates()
+        self.grid = {}      #spatial index of creature groups
+        self.group_grid = {}
+        for group in ('algae', 'bacterium', 'paramecium', 'amoeba'):
+            self.grid[group] = SpatialGrid()
+            self.group_grid[self.cells[group]] = self.grid[group]
         self.species = [Algae,
                         Bacterium,
                         Paramecium,
@@ -58,18 +95,27 @@ class Matrix(object):
                               Paramecium: self.cells['paramecium'],
                               Amoeba: self.cells['amoeba'],
                               Ciliate: self.cells['paramecium']}
-        self.media = numpy.fromfunction(
-            lambda xf,yf: ((1.0 / ((((xf - (self.x/2))**2)
-                            + (yf - (self.y/2))**2) + 1.0)) * 1000000),
-                           (self.x, self.y))   #+1.0 to avoid div by zero
-        self.media = numpy.where(self.media>2, self.media, 0)   #min diffuse level and defines circular edge
-        self.media = self.media.astype('i')       #type for pygame.surfarray.blit_array()
-        self.nutrient = numpy.zeros((self.x,self.y), 'i')
+        self.media_kernel, self.media_origin = self.media_setup()     #gradient kernel
+        self.field_dtype = numpy.dtype(parameters.get('field_dtype') or 'int32')     #nutrient/toxin type
+        if self.field_dtype.kind in 'iu' and self.field_dtype.itemsize < 4:
+            self.field_limit = numpy.iinfo(self.field_dtype).max    #compact field saturates
+        else:
+            self.field_limit = None
+        self.field_path = parameters.get('field_path')     #memory mapped field directory
+        self.nutrient = self.field_array('nutrient', self.field_dtype)
         self.toxin_presense = False     #if toxin used
-        self.trace = numpy.zeros((self.x,self.y), 'B')      #bacteria scent trace
+        self.trace = self.field_array('trace', 'B')      #bacteria scent trace
         self.trace_update = 0
-        self.trace_x = 0
-        self.trace_y = 0
+        if parameters.get('chunk_size') != 0:
+            self.chunks = ChunkMap(self, parameters.get('chunk_size') or 250,
+                                   parameters.get('lod_distance'),
+                                   parameters.get('lod_interval') or 4)   #inactive chunks asleep
+        else:
+            self.chunks = None
+        self.trace_decay = TraceDecay(self.trace,
+                                      parameters.get('trace_decay') or 27,
+                                      threaded=parameters.get('trace_thread'),
+                                      chunks=self.chunks)     #whole field decayed over period ticks
         self.trace_display = False  #visual display of bacterium trace
         self.field_x = 0       #field scroll
         self.field_y = 0
@@ -77,24 +123,59 @@ class Matrix(object):
         self.screen_update = True    #screen update at intervals
         self.screen_update_count = 0
         self.update_list = []    #list of all rect to be updated on display
-        self.matrix_surface = pygame.Surface((self.dx,self.dy))
+        self.field_tile = 25    #field dirty tile size
+        self.field_dirty = numpy.zeros(
+            ((self.x-1)//self.field_tile+1, (self.y-1)//self.field_tile+1),
+            bool)   #field tiles changed since display
+        self.field_changed = False  #dirty tiles to display
+        if not self.headless:
+            self.matrix_surface = pygame.Surface((self.dx,self.dy))
+            self.renderer = FieldRenderer(self.matrix_surface,
+                                          (self.dx,self.dy),
+                                          parameters.get('field_color'))
+        else:
+            self.matrix_surface = None
+            self.renderer = None
         self.scroll_field = {'x': None, 'y': None}
         self.scroll_step = 2    #scroll_rate:5, bug_follow:2
         self.mouse_x = 0
         self.mouse_y = 0
         self.mouse_x_pre = 0
         self.mouse_y_pre = 0
-        self.zoom_surface = pygame.display.get_surface()
         self.zoom_set = False   #Zoom settings
         self.zoom_power = 2
         self.zoom_init = False
-        self.surface_clear = pygame.Surface((200,200))  #zoom clear
+        if not self.headless:
+            self.zoom_surface = pygame.display.get_surface()
+            self.surface_clear = pygame.Surface((200,200))  #zoom clear
+        else:
+            self.zoom_surface = None
+            self.surface_clear = None
         self.bug_tag = None
         self.bug_follow = False  #when bug tagged, determine if view follows
         self.evolution = False  #evolve
         self.tag_display = True     #whether tag is displayed
         self.newspecies = {}    #newspecies objects
         self.control = None
+        self.tick = 0   #simulation ticks elapsed
+        self.amoeba_animation = []  #amoebas in view to animate
+        self.pool = {}  #dead creatures of species for reuse
+        if parameters.get('bacterium_engine') == 'array':
+            self.colony = BacteriumColony(self)     #bacterium as arrays
+        else:
+            self.colony = None
+        if parameters.get('diffusion') or parameters.get('field_decay'):
+            self.diffusion = FieldDiffusion(self,
+                parameters.get('diffusion') or 0.0,
+                parameters.get('diffusion_interval') or 10,
+                parameters.get('field_decay') or 0.0,
+                parameters.get('diffusion_method') or 'stencil')    #nutrient/toxin spread
+        else:
+            self.diffusion = None
+        if parameters.get('paramecium_engine') == 'array':
+            self.paramecium_kernel = ParameciumKernel(self)   #batched motion
+        else:
+            self.paramecium_kernel = None
 
     def setup(self, algae=True, bacterium=True, paramecium=True,
               amoeba=True, ciliate=True):
@@ -104,13 +185,15 @@ class Matrix(object):
                      Amoeba: amoeba,
                      Ciliate: ciliate}
         repeat = 3
+        positions = []
         for i in range((self.x*self.y) // 150000):
-            x = random.randrange(0, self.x)
-            y = random.randrange(0, self.y)
-            self.gradient(x,y)
+            x = self.random.randrange(0, self.x)
+            y = self.random.randrange(0, self.y)
+            positions.append((x,y))
             if repeat:
-                self.gradient(x,y)
+                positions.append((x,y))
                 repeat -= 1
+        self.gradients(positions)
         for cell in self.species:
             if creatures[cell]:
                 while(cell.count < cell.minimum):
@@ -123,52 +206,180 @@ class Matrix(object):
                 self.gradient(x + self.field_x,
                               y + self.field_y,
                               gradient_type='Nutrient')
-                self.screen_update_count = 0
-                self.screen_update = True
+                self.field_changed = True
         elif gradient_type == 'Toxin':
             if not self.toxin_presense:
-                self.toxin = numpy.zeros((self.x,self.y), 'i')
-                self.toxinx = numpy.zeros((self.dx,self.dy), 'i')
+                self.toxin = self.field_array('toxin', self.field_dtype)
                 self.toxin_presense = True
             if not self.toxin[x + self.field_x,
                               y + self.field_y] > 1000000:     #max toxin per locale
                 self.gradient(x + self.field_x,
                               y + self.field_y,
                               gradient_type='Toxin')
-                self.screen_update_count = 0
-                self.screen_update = True
+                self.field_changed = True
+
+    def field_array(self, name, dtype):
+        """
+        Return zeroed field of matrix dimension. With field_path set,
+        field is memory mapped to name.npy in path, paged in by the
+        OS as accessed and readable by numpy.load(mmap_mode='r').
+        """
+        if not self.field_path:
+            return numpy.zeros((self.x,self.y), dtype)
+        if not os.path.isdir(self.field_path):
+            os.makedirs(self.field_path)
+        return numpy.lib.format.open_memmap(
+            os.path.join(self.field_path, name+'.npy'),
+            mode='w+', dtype=dtype, shape=(self.x,self.y))
+
+    def field_flush(self):
+        "Write memory mapped fields to file."
+        fields = [self.nutrient, self.trace]
+        if self.toxin_presense:
+            fields.append(self.toxin)
+        for field in fields:
+            if isinstance(field, numpy.memmap):
+                field.flush()
+
+    def media_setup(self, level=1000000, minimum=2, path='cache'):
+        """
+        Return media gradient kernel at radius where level exceeds minimum,
+        and kernel index of gradient position. Kernel values are those of
+        media centered in matrix, and kernel is cached in path.
+        Level and minimum are taken as integers.
+        """
+        level = int(round(level))
+        minimum = int(round(minimum))
+        radius = int(math.sqrt(level/minimum)) + 1
+        x1 = max(self.x//2 - radius, 0)     #window of media in matrix
+        x2 = min(self.x//2 + radius, self.x-1)
+        y1 = max(self.y//2 - radius, 0)
+        y2 = min(self.y//2 + radius, self.y-1)
+        file_name = os.path.join(path, 'media_%d_%d_%d_%d_%d_%d.npz' %
+                                 (self.x-2*x1, x2-x1, self.y-2*y1, y2-y1,
+                                  level, minimum))    #center offset in half pixels
+        try:
+            with numpy.load(file_name) as media:
+                return (media['kernel'],
+                        tuple(int(i) for i in media['origin']))
+        except Exception:     #missing, truncated or corrupt cache recomputed
+            pass
+        kernel = numpy.fromfunction(
+            lambda xf,yf: ((1.0 / (((((xf+x1) - (self.x/2))**2)
+                            + ((yf+y1) - (self.y/2))**2) + 1.0)) * level),
+                           (x2-x1+1, y2-y1+1))   #+1.0 to avoid div by zero
+        kernel = numpy.where(kernel>minimum, kernel, 0)   #min diffuse level and defines circular edge
+        kernel = kernel.astype('i')
+        extent_x = numpy.nonzero(kernel.any(axis=1))[0]
+        extent_y = numpy.nonzero(kernel.any(axis=0))[0]
+        kernel = kernel[extent_x[0]:extent_x[-1]+1,
+                        extent_y[0]:extent_y[-1]+1]    #nonzero support
+        origin = (int(self.x//2 - x1 - extent_x[0]),
+                  int(self.y//2 - y1 - extent_y[0]))
+        temp_name = None
+        try:
+            if not os.path.isdir(path):
+                os.mkdir(path)
+            handle, temp_name = tempfile.mkstemp(suffix='.npz', dir=path)
+            with os.fdopen(handle, 'wb') as temp_file:
+                numpy.savez(temp_file, kernel=kernel, origin=origin)
+            replace = getattr(os, 'replace', os.rename)    #python 2 rename
+            replace(temp_name, file_name)   #complete file, atomic for concurrent runs
+        except (IOError, OSError):
+            if temp_name and os.path.exists(temp_name):
+                os.remove(temp_name)
+        return kernel, origin
 
     def gradient(self, x, y, gradient_type='Nutrient'):
-        dx = abs(x - (self.x//2))   #position offset from matrix center
-        dy = abs(y - (self.y//2))
-        if x <= self.x//2:        #define overlapping area of matrices to be combined
-            matx1 = 0
-            matx2 = self.x - dx
-            medx1 = 0 + dx
-            medx2 = self.x
-        else:
-            matx1 = 0 + dx
-            matx2 = self.x
-            medx1 = 0
-            medx2 = self.x - dx
-        if y <= self.y//2:
-            maty1 = 0
-            maty2 = self.y - dy
-            medy1 = 0 + dy
-            medy2 = self.y
-        else:
-            maty1 = 0 + dy
-            maty2 = self.y
-            medy1 = 0
-            medy2 = self.y - dy
+        self.gradients([(x,y)], gradient_type)
+
+    def gradients(self, positions, gradient_type='Nutrient'):
+        "Add media gradient at each matrix position, over kernel window."
         if gradient_type == 'Nutrient':
-            self.nutrient[matx1:matx2,maty1:maty2] = (
-                numpy.add(self.nutrient[matx1:matx2, maty1:maty2],
-                          self.media[medx1:medx2, medy1:medy2]))
+            field = self.nutrient
         elif gradient_type == 'Toxin':
-            self.toxin[matx1:matx2,maty1:maty2] = (
-                numpy.add(self.toxin[matx1:matx2, maty1:maty2],
-                          self.media[medx1:medx2, medy1:medy2]))
+            field = self.toxin
+        origin_x, origin_y = self.media_origin
+        size_x, size_y = self.media_kernel.shape
+        for x, y in positions:
+            left = x - origin_x     #kernel position in matrix
+            top = y - origin_y
+            x1 = max(left, 0)
+            y1 = max(top, 0)
+            x2 = min(left+size_x, self.x)
+            y2 = min(top+size_y, self.y)
+            if x1 >= x2 or y1 >= y2:
+                continue
+            window = field[x1:x2,y1:y2]
+            kernel = self.media_kernel[x1-left:x2-left, y1-top:y2-top]
+            if self.field_limit is None:
+                numpy.add(window, kernel, out=window, casting='unsafe')
+            else:
+                total = numpy.add(window, kernel, dtype='i')
+                numpy.minimum(total, self.field_limit, out=total)
+                window[...] = total
+            self.field_mark(x1, y1, x2, y2)
+
+    def field_consume(self, x, y, amount):
+        "Subtract amount from nutrient at positions x,y, saturating at zero."
+        index = x * self.y + y
+        position, inverse = numpy.unique(index, return_inverse=True)
+        total = numpy.bincount(inverse.ravel(), weights=amount)   #repeat positions summed
+        px, py = numpy.divmod(position, self.y)
+        level = self.nutrient[px,py] - total
+        numpy.maximum(level, 0, out=level)
+        self.nutrient[px,py] = level
+
+    def field_mark(self, x1, y1, x2, y2):
+        "Mark matrix region of nutrient/toxin field changed for display."
+        tile = self.field_tile
+        x1 = max(x1, 0) // tile
+        y1 = max(y1, 0) // tile
+        x2 = (min(x2, self.x) - 1) // tile + 1
+        y2 = (min(y2, self.y) - 1) // tile + 1
+        self.field_dirty[x1:x2,y1:y2] = True
+        if self.chunks:
+            self.chunks.field_mark(x1*tile, y1*tile, x2*tile, y2*tile)
+
+    def field_blit(self, x1, y1, x2, y2):
+        "Render matrix region of field to matrix_surface and screen."
+        if self.toxin_presense:
+            toxin = self.toxin[x1:x2,y1:y2]
+        else:
+            toxin = None
+        rect = pygame.Rect(x1-self.field_x, y1-self.field_y, x2-x1, y2-y1)
+        self.renderer.render(self.matrix_surface, rect,
+                             self.nutrient[x1:x2,y1:y2], toxin)
+        return rect
+
+    def field_render(self):
+        "Render changed field tiles in view, updating only those."
+        tile = self.field_tile
+        tx1 = self.field_x // tile
+        ty1 = self.field_y // tile
+        tx2 = (self.field_x+self.dx-1) // tile + 1
+        ty2 = (self.field_y+self.dy-1) // tile + 1
+        dirty = self.field_dirty[tx1:tx2,ty1:ty2]
+        tiles_x, tiles_y = dirty.nonzero()
+        if not len(tiles_x):
+            return
+        x1 = max((tx1+tiles_x.min()) * tile, self.field_x)
+        y1 = max((ty1+tiles_y.min()) * tile, self.field_y)
+        x2 = min((tx1+tiles_x.max()+1) * tile, self.field_x+self.dx)
+        y2 = min((ty1+tiles_y.max()+1) * tile, self.field_y+self.dy)
+        if len(tiles_x) * tile * tile * 2 > (x2-x1) * (y2-y1):    #render bounds when mostly dirty
+            tiles = [(x1,y1,x2,y2)]
+        else:
+            tiles = [(max((tx1+tx) * tile, self.field_x),
+                      max((ty1+ty) * tile, self.field_y),
+                      min((tx1+tx+1) * tile, self.field_x+self.dx),
+                      min((ty1+ty+1) * tile, self.field_y+self.dy))
+                     for tx, ty in zip(tiles_x, tiles_y)]
+        for x1, y1, x2, y2 in tiles:
+            rect = self.field_blit(x1, y1, x2, y2)
+            self.screen.blit(self.matrix_surface, rect.topleft, rect)
+            self.update_list.append(rect)
+        dirty[:] = False
 
     def add_creature(self, species, x=None, y=None, clone=False,
                      identity=None, inherit=None):
@@ -192,68 +403,91 @@ class Matrix(object):
         matrix = self
         if species is Algae:
             if Algae.count < Algae.maximum:
-                x = x or random.randrange(10, self.x-10)    #boundary -10 to remain in range
-                y = y or random.randrange(10, self.y-10)
-                self.cells['algae'].add(Algae(matrix, x, y))
+                x = x or self.random.randrange(10, self.x-10)    #boundary -10 to remain in range
+                y = y or self.random.randrange(10, self.y-10)
+                self.creature_add(self.creature_new(Algae, matrix, x, y),
+                                  self.cells['algae'])
         elif species is Bacterium:
             if Bacterium.count < Bacterium.maximum:
-                x = x or random.randrange(10, self.x-10)
-                y = y or random.randrange(10, self.y-10)
-                self.cells['bacterium'].add(
-                    Bacterium(matrix, x, y, identity=identity,
-                              inherit=inherit))
+                x = x or self.random.randrange(10, self.x-10)
+                y = y or self.random.randrange(10, self.y-10)
+                if self.colony:
+                    if inherit:
+                        inherit = [[inherit[genex]
+                                    for genex in sorted(inherit)]]
+                    self.colony.add([x], [y], [identity], inherit)
+                    return
+                self.creature_add(
+                    self.creature_new(Bacterium, matrix, x, y,
+                                      identity=identity, inherit=inherit,
+                                      mutation_rate=self.mutation_rate),
+                    self.cells['bacterium'])
         elif species is Paramecium:
             if Paramecium.count < Paramecium.maximum:
-                x = x or random.randrange(100, self.x-100)
-                y = y or random.randrange(100, self.y-100)
-                self.cells['paramecium'].add(
-                    Paramecium(matrix, x, y, identity=identity,
-                               inherit=inherit))
+                x = x or self.random.randrange(100, self.x-100)
+                y = y or self.random.randrange(100, self.y-100)
+                self.creature_add(
+                    self.creature_new(Paramecium, matrix, x, y,
+                                      identity=identity, inherit=inherit,
+                                      mutation_rate=self.mutation_rate),
+                    self.cells['paramecium'])
         elif species is Amoeba:
             if Amoeba.count < Amoeba.maximum:
-                amoeba_color = random.choice((50, 170, 800, 1000))
-                x = x or random.randrange(100, self.x-100)
-                y = y or random.randrange(100, self.y-100)
-                self.cells['amoeba'].add(
-                    Amoeba(matrix, x, y, color=amoeba_color, identity=identity,
-                           inherit=inherit))
+                amoeba_color = self.random.choice((50, 170, 800, 1000))
+                x = x or self.random.randrange(100, self.x-100)
+                y = y or self.random.randrange(100, self.y-100)
+                self.creature_add(
+                    self.creature_new(Amoeba, matrix, x, y, color=amoeba_color,
+                                      identity=identity, inherit=inherit,
+                                      mutation_rate=self.mutation_rate),
+                    self.cells['amoeba'])
         elif species is Ciliate:
             if Ciliate.count < Ciliate.maximum:
-                x = x or random.randrange(100, self.x-100)
-                y = y or random.randrange(100, self.y-100)
-                self.cells['paramecium'].add(
-                    Ciliate(matrix, x, y, identity=identity,
-                            inherit=inherit))
+                x = x or self.random.randrange(100, self.x-100)
+                y = y or self.random.randrange(100, self.y-100)
+                self.creature_add(
+                    self.creature_new(Ciliate, matrix, x, y,
+                                      identity=identity, inherit=inherit,
+                                      mutation_rate=self.mutation_rate),
+                    self.cells['paramecium'])
         elif species in self.newspecies.values():
             if species.count < species.maximum:
-                x = x or random.randrange(100, self.x-100)
-                y = y or random.randrange(100, self.y-100)
-                self.species_group[species.progenitor].add(
-                    species(matrix, x, y, identity=identity,
-                            inherit=inherit))
+                x = x or self.random.randrange(100, self.x-100)
+                y = y or self.random.randrange(100, self.y-100)
+                self.creature_add(
+                    self.creature_new(species, matrix, x, y,
+                                      identity=identity, inherit=inherit,
+                                      mutation_rate=self.mutation_rate),
+                    self.species_group[species.progenitor])
+
+    def creature_new(self, species, *args, **kwargs):
+        "Return creature of species, recycled from pool if available."
+        pool = self.pool.get(species)
+        if pool:
+            creature = pool.pop()
+            creature.__init__(*args, **kwargs)
+            return creature
+        return species(*args, **kwargs)
+
+    def creature_release(self, creatures):
+        "Remove dead creatures from groups, keeping them in species pool."
+        for creature in creatures:
+            creature.kill()
+            pool = self.pool.setdefault(creature.species, [])
+            if len(pool) < creature.species.maximum:
+                pool.append(creature)
+
+    def creature_add(self, creature, group):
+        "Add creature to group and its spatial index."
+        group.add(creature)
+        self.group_grid[group].insert(creature)
 
     def set_scroll(self, direction=None,
                    field_change=None, scroll='manual'):
         if scroll == 'manual' and self.scroll_step == 2:
             self.scroll_step = 5    #manual
-            self.matrix_change_x = numpy.zeros(
-                (self.scroll_step,self.dy), 'i')
-            self.matrix_change_surface_x = pygame.Surface(
-                (self.scroll_step,self.dy))
-            self.matrix_change_y = numpy.zeros(
-                (self.dx,self.scroll_step), 'i')
-            self.matrix_change_surface_y = pygame.Surface(
-                (self.dx,self.scroll_step))
         elif scroll == 'auto' and self.scroll_step == 5:
             self.scroll_step = 2    #auto
-            self.matrix_change_x = numpy.zeros(
-                (self.scroll_step,self.dy), 'i')
-            self.matrix_change_surface_x = pygame.Surface(
-                (self.scroll_step,self.dy))
-            self.matrix_change_y = numpy.zeros(
-                (self.dx,self.scroll_step), 'i')
-            self.matrix_change_surface_y = pygame.Surface(
-                (self.dx,self.scroll_step))
         if field_change == 0:
             if direction in ('north', 'south', 'y'):
                 self.scroll_field['y'] = None
@@ -284,106 +518,53 @@ class Matrix(object):
 
     def scroll(self):
         step = self.scroll_step
+        shift_x = 0
+        shift_y = 0
         if self.scroll_field['y']:
             if (self.scroll_field['y'] == 'north' and
                     self.field_y >= step):
                 self.field_y -= step
-                self.matrix_change_y = self.nutrient[
-                    0+self.field_x:self.dx+self.field_x,
-                    0+self.field_y:0+self.field_y+step]
-                if self.toxin_presense:
-                    self.toxin_change_y = self.toxin[
-                        0+self.field_x:self.dx+self.field_x,
-                        0+self.field_y:0+self.field_y+step]
-                    self.toxin_change_y = numpy.where(
-                        self.toxin_change_y>10000,
-                        self.toxin_change_y, 0)
-                    self.matrix_change_y = numpy.subtract(
-                        self.matrix_change_y, self.toxin_change_y)
-                pygame.surfarray.blit_array(
-                    self.matrix_change_surface_y,
-                    self.matrix_change_y)
-                self.matrix_surface.blit(
-                    self.matrix_surface.copy(), (0,step),
-                    (0,0,self.dx,self.dy-step))
-                self.matrix_surface.blit(
-                    self.matrix_change_surface_y, (0,0))
+                shift_y = step
             elif (self.scroll_field['y'] == 'south' and
                     self.field_y < self.y-self.dy-step):
                 self.field_y += step
-                self.matrix_change_y = self.nutrient[
-                    0+self.field_x:self.dx+self.field_x,
-                    self.dy+self.field_y-step:self.dy+self.field_y]
-                if self.toxin_presense:
-                    self.toxin_change_y = self.toxin[
-                        0+self.field_x:self.dx+self.field_x,
-                        self.dy+self.field_y-step:self.dy+self.field_y]
-                    self.toxin_change_y = numpy.where(
-                        self.toxin_change_y>10000,
-                        self.toxin_change_y, 0)
-                    self.matrix_change_y = numpy.subtract(
-                        self.matrix_change_y, self.toxin_change_y)
-                pygame.surfarray.blit_array(
-                    self.matrix_change_surface_y, self.matrix_change_y)
-                self.matrix_surface.blit(
-                    self.matrix_surface.copy(), (0,0),
-                    (0,step,self.dx,self.dy-step))
-                self.matrix_surface.blit(
-                    self.matrix_change_surface_y, (0,self.dy-step))
+                shift_y = -step
             else:
                 self.scroll_field['y'] = None
         if self.scroll_field['x']:
             if self.scroll_field['x'] == 'west' and self.field_x >= step:
                 self.field_x -= step
-                self.matrix_change_x = self.nutrient[
-                    0+self.field_x:0+self.field_x+step,
-                    0+self.field_y:self.dy+self.field_y]
-                if self.toxin_presense:
-                    self.toxin_change_x = self.toxin[
-                        0+self.field_x:0+self.field_x+step,
-                        0+self.field_y:self.dy+self.field_y]
-                    self.toxin_change_x = numpy.where(
-                        self.toxin_change_x>10000,
-                        self.toxin_change_x, 0)
-                    self.matrix_change_x = numpy.subtract(
-                        self.matrix_change_x, self.toxin_change_x)
-                pygame.surfarray.blit_array(
-                    self.matrix_change_surface_x,
-                    self.matrix_change_x)
-                self.matrix_surface.blit(
-                    self.matrix_surface.copy(), (step,0),
-                    (0,0,self.dx-step,self.dy))
-                self.matrix_surface.blit(
-                    self.matrix_change_surface_x, (0,0))
+                shift_x = step
             elif (self.scroll_field['x'] == 'east' and
                     self.field_x < self.x-self.dx-step):
                 self.field_x += step
-                self.matrix_change_x = self.nutrient[
-                    self.dx+self.field_x-step:self.dx+self.field_x,
-                    0+self.field_y:self.dy+self.field_y]
-                if self.toxin_presense:
-                    self.toxin_change_x = self.toxin[
-                        self.dx+self.field_x-step:self.dx+self.field_x,
-                        0+self.field_y:self.dy+self.field_y]
-                    self.toxin_change_x = numpy.where(
-                        self.toxin_change_x>10000,
-                        self.toxin_change_x, 0)
-                    self.matrix_change_x = numpy.subtract(
-                        self.matrix_change_x, self.toxin_change_x)
-                pygame.surfarray.blit_array(
-                    self.matrix_change_surface_x,
-                    self.matrix_change_x)
-                self.matrix_surface.blit(
-                    self.matrix_surface.copy(), (0,0),
-                    (step,0,self.dx-step,self.dy))
-                self.matrix_surface.blit(
-                    self.matrix_change_surface_x, (self.dx-step,0))
+                shift_x = -step
             else:
                 self.scroll_field['x'] = None
-        if self.scroll_field['y'] or self.scroll_field['x']:
+        if shift_x or shift_y:
+            self.surface_scroll(self.matrix_surface, shift_x, shift_y)
+            if shift_y > 0:     #render exposed strips
+                self.field_blit(self.field_x, self.field_y,
+                                self.dx+self.field_x, self.field_y+step)
+            elif shift_y < 0:
+                self.field_blit(self.field_x, self.dy+self.field_y-step,
+                                self.dx+self.field_x, self.dy+self.field_y)
+            if shift_x > 0:
+                self.field_blit(self.field_x, self.field_y,
+                                self.field_x+step, self.dy+self.field_y)
+            elif shift_x < 0:
+                self.field_blit(self.dx+self.field_x-step, self.field_y,
+                                self.dx+self.field_x, self.dy+self.field_y)
             self.screen.blit(self.matrix_surface, (0,0))
             self.update_list.append(self.screen.get_rect())
 
+    def surface_scroll(self, surface, shift_x, shift_y):
+        "Shift surface contents in place."
+        try:
+            surface.scroll(shift_x, shift_y)
+        except AttributeError:  #pygame<1.9
+            surface.blit(surface.copy(), (shift_x,shift_y))
+
     def bug_track(self):
         adj = 0
         field_change = self.scroll_step-1
@@ -527,7 +708,8 @@ class Matrix(object):
                     bug_species, mouse_x+self.field_x, mouse_y+self.field_y,
                     cell_image=img, frames=None, identity=bug_id,
                     inherit=bug_gene, mutation_rate=0)
-                self.species_group[bug_species].add(newSpecies)
+                self.creature_add(newSpecies,
+                                  self.species_group[bug_species])
                 if species in self.newspecies:   #rename if already present, in case saved file was changed
                     key = species
                     while key in self.newspecies:
@@ -539,15 +721,18 @@ class Matrix(object):
                 if (self.newspecies[species].count <
                         self.newspecies[species].maximum):
                     matrix = self
-                    self.species_group[bug_species].add(
-                        self.newspecies[species](matrix,
-                        mouse_x+self.field_x, mouse_y+self.field_y,
-                        identity=bug_id, inherit=bug_gene, mutation_rate=0))
+                    self.creature_add(
+                        self.creature_new(self.newspecies[species], matrix,
+                            mouse_x+self.field_x, mouse_y+self.field_y,
+                            identity=bug_id, inherit=bug_gene,
+                            mutation_rate=0),
+                        self.species_group[bug_species])
 
     def create_species(self, Progenitor, x, y, cell_image=None, frames=2,
                        identity=None, inherit=None, mutation_rate=0):
         class NewSpecies(Progenitor):
             image = None
+            rotation = None
             count = 0
             minimum = Progenitor.minimum
             maximum = Progenitor.maximum
@@ -583,25 +768,18 @@ class Matrix(object):
         return newSpecies
 
     def bug_trace_update(self):
+        self.trace_decay.update()   #decay at rate that gradient detectable over cell
+
+    def bug_trace_render(self):
+        "Render trace on display every third frame, with trace display set."
         self.trace_update += 1
-        if self.trace_update > 2:   #update trace decay at rate that gradient detectable over cell
-            trace_view = self.trace[
-                (self.dx*self.trace_x):self.dx+(self.dx*self.trace_x),
-                (self.dy*self.trace_y):self.dy+(self.dy*self.trace_y)]
-            trace_view[trace_view>9] -= 10
+        if self.trace_update > 2:
             self.trace_update = 0
-            self.trace_x += 1
-            if self.trace_x > 2:
-                self.trace_x = 0
-                self.trace_y += 1
-            if self.trace_y > 2:
-                self.trace_x = 0
-                self.trace_y = 0
             if self.trace_display:
-                trace_temp = numpy.array(
+                self.renderer.render_trace(
+                    self.screen,
                     self.trace[self.field_x:self.dx+self.field_x,
-                               self.field_y:self.dy+self.field_y], 'i')
-                pygame.surfarray.blit_array(self.screen, trace_temp)
+                               self.field_y:self.dy+self.field_y])
                 self.update_list.append(self.screen.get_rect())
 
     def set_evolution(self, setting='Toggle'):
@@ -693,85 +871,109 @@ class Matrix(object):
     def display(self):
         if self.screen_update:   #only update at intervals
             if not self.screen_update_count:
-                self.matrixx = self.nutrient[
-                    0+self.field_x:self.dx+self.field_x,
-                    0+self.field_y:self.dy+self.field_y]    #Matrix     #overlap?
-                if self.toxin_presense:
-                    self.toxinx = numpy.array(
-                        self.toxin[0+self.field_x:self.dx+self.field_x,
-                        0+self.field_y:self.dy+self.field_y])  #require numpy.array or slice?
-                    self.toxinx = numpy.where(
-                        self.toxinx>10000, self.toxinx, 0)
-                    self.matrixx = numpy.subtract(
-                        self.matrixx, self.toxinx)
-                pygame.surfarray.blit_array(
-                    self.matrix_surface, self.matrixx)
+                self.field_blit(self.field_x, self.field_y,
+                                self.dx+self.field_x, self.dy+self.field_y)
+                tile = self.field_tile
+                self.field_dirty[
+                    self.field_x//tile:(self.field_x+self.dx-1)//tile+1,
+                    self.field_y//tile:(self.field_y+self.dy-1)//tile+1] = False
             self.screen.blit(self.matrix_surface, (0,0))
             self.update_list.append(self.screen.get_rect())
             self.screen_update = False
+        elif self.field_changed:
+            self.field_render()     #changed tiles only
+            self.field_changed = False
         self.screen_update_count += 1
         if self.screen_update_count > 1000:    #change update to compensate for computer load
-            self.screen_update_count = 0       #during update, zoom blinks screen...
-            self.screen_update = True
+            self.screen_update_count = 0       #display field consumption
+            self.field_changed = True
 
     def creature_inview(self, creature):
-        if creature in self.cells['creatures']:
-            return True
-        else:
-            return False
+        return creature.inview
+
+    def creature_collide(self, creature, group):
+        "Creatures of group colliding with creature, from spatial index"
+        collided = self.grid[group].collide(creature)
+        if group == 'bacterium' and self.colony:
+            collided.extend(self.colony.collide(creature))
+        return collided
+
+    def step(self, ticks=1):
+        "Advance simulation by ticks, without display update"
+        for tick in range(ticks):
+            for group in self.grid:
+                self.grid[group].build(self.cells[group])
+            if self.chunks:
+                self.chunks.update()
+            self.group_update('algae')
+            self.group_update('bacterium')
+            if self.colony:
+                self.colony.update()
+            self.group_update('amoeba')
+            animate_amoebas(self.amoeba_animation)
+            del self.amoeba_animation[:]
+            paramecia = self.group_select('paramecium')
+            if self.paramecium_kernel:
+                self.paramecium_kernel.motion(paramecia)
+            for bug in paramecia:
+                bug.update()
+            dead = []
+            for group in ('algae', 'bacterium', 'amoeba', 'paramecium'):
+                dead.extend([bug for bug in self.cells[group]
+                             if not bug.life_check()])
+            if dead:
+                if self.bug_tag in dead:
+                    self.bug_track_remove(self.bug_tag)
+                self.creature_release(dead)
+            if self.colony and self.colony.sweep():
+                if self.bug_tag and not self.bug_tag.life:
+                    self.bug_track_remove()
+            self.bug_trace_update()
+            if self.diffusion:
+                self.diffusion.update()
+            self.tick += 1
+
+    def group_select(self, group):
+        "Creatures of group to update this tick."
+        if self.chunks:
+            return self.chunks.select(self.cells[group].sprites())
+        return self.cells[group].sprites()
+
+    def group_update(self, group):
+        for bug in self.group_select(group):
+            bug.update()
+
+    def creatures_within(self, group, margin):
+        "Creatures of group within display and margin, set inview."
+        sprites = [bug for bug in self.grid[group].within(
+                       self.field_x-margin, self.field_y-margin,
+                       self.dx+self.field_x+margin,
+                       self.dy+self.field_y+margin)
+                   if bug.alive()]     #from spatial index, excluding removed
+        for bug in sprites:
+            bug.inview = True
+            bug.image_rotate()  #image to direction of rect
+        return sprites
 
     def creatures_update(self):
-        "Update all creatures and populate update_list of creatures on screen for display"
-        self.cells['algae'].update()
-        self.cells['bacterium'].update()
-        self.cells['amoeba'].update()
-        self.cells['paramecium'].update()
-        #update creatures in view
-        self.cells['creatures'].empty()     #have bug check and report if onscreen?
-        #algae update
-        for bug in self.cells['algae']:
-            if bug.life_check():
-                if (bug.rect.centerx > self.field_x-self.overlap//5 and
-                    bug.rect.centerx < self.dx+self.field_x+self.overlap//5 and
-                    bug.rect.centery > self.field_y-self.overlap//5 and
-                    bug.rect.centery < self.dy+self.field_y+self.overlap//5):
-                    self.cells['creatures'].add(bug)    #draw cells onscreen, with display overlap/5
-            else:
-                self.bug_track_remove(bug)
-                self.cells['algae'].remove(bug)
-        #bacterium update
-        for bug in self.cells['bacterium']:
-            if bug.life_check():
-                if (bug.rect.centerx > self.field_x-self.overlap//5 and
-                    bug.rect.centerx < self.dx+self.field_x+self.overlap//5 and
-                    bug.rect.centery > self.field_y-self.overlap//5 and
-                    bug.rect.centery < self.dy+self.field_y+self.overlap//5):
-                    self.cells['creatures'].add(bug)      #draw cells onscreen, with display overlap/5
-            else:
-                self.bug_track_remove(bug)
-                self.cells['bacterium'].remove(bug)
-        #amoeba update
-        for bug in self.cells['amoeba']:
-            if bug.life_check():
-                if (bug.rect.centerx > self.field_x-self.overlap and
-                    bug.rect.centerx < self.dx+self.field_x+self.overlap and
-                    bug.rect.centery > self.field_y-self.overlap and
-                    bug.rect.centery < self.dy+self.field_y+self.overlap):
-                    self.cells['creatures'].add(bug)
-            else:
-                self.bug_track_remove(bug)
-                self.cells['amoeba'].remove(bug)
-        #paramecium update
-        for bug in self.cells['paramecium']:
-            if bug.life_check():
-                if (bug.rect.centerx > self.field_x-self.overlap and
-                    bug.rect.centerx < self.dx+self.field_x+self.overlap and
-                    bug.rect.centery > self.field_y-self.overlap and
-                    bug.rect.centery < self.dy+self.field_y+self.overlap):
-                    self.cells['creatures'].add(bug)    #draw cells onscreen, with display overlap
-            else:
-                self.bug_track_remove(bug)
-                self.cells['paramecium'].remove(bug)
+        "Populate update_list of creatures on screen for display"
+        view = self.cells['creatures']
+        for bug in view:
+            bug.inview = False
+        view.empty()
+        margin = self.overlap//5    #display overlap/5
+        view.add(self.creatures_within('algae', margin))
+        view.add(self.creatures_within('bacterium', margin))
+        if self.colony:
+            colony_view = self.colony.materialize(
+                self.field_x-margin, self.field_y-margin,
+                self.dx+self.field_x+margin, self.dy+self.field_y+margin,
+                self.bug_tag)
+            for bug in colony_view:
+                bug.inview = True
+            view.add(colony_view)
+        view.add(self.creatures_within('amoeba', self.overlap))
+        view.add(self.creatures_within('paramecium', self.overlap))
         #Display label
         if self.bug_tag and not self.bug_follow:
             if self.tag_display:
@@ -796,9 +998,16 @@ class Matrix(object):
         for bug in self.cells['creatures']:       #restore location
             bug.rect.centerx += self.field_x
             bug.rect.centery += self.field_y
-        self.bug_trace_update()
+        self.bug_trace_render()
 
-    def update(self):
+    def update(self, ticks=1):
+        """
+        Advance simulation by ticks and update display.
+        With ticks=0 only display is updated.
+        """
+        self.step(ticks)
+        if self.headless:
+            return
         self.update_list = []
         self.display()
         if self.scroll_field['x'] or self.scroll_field['y']:
@@ -813,4 +1022,3 @@ class Matrix(object):
             self.field_zoom('clear')
             self.creatures_update()
             self.field_zoom('activate')
-
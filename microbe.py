@@ -32,7 +32,7 @@ if not monitoring:
     import warnings
     warnings.filterwarnings("ignore")
 
-import optparse, sys
+import optparse, sys, time
 
 import interphase      #interface control
 from matrix import Matrix
@@ -44,10 +44,33 @@ from amoeba import Amoeba
 from ciliate import Ciliate
 
 
-def program_options():
+def program_options(arguments=None):
     config = {'species_added':None,
               'species_evolving':None,
-              'display_gamma':None}
+              'display_gamma':None,
+              'headless':None,
+              'ticks':None,
+              'tick_ratio':None,
+              'frame_rate':None,
+              'bacterium_engine':None,
+              'paramecium_engine':None,
+              'rotation_step':None,
+              'field_color':None,
+              'trace_decay':None,
+              'trace_thread':None,
+              'diffusion':None,
+              'diffusion_interval':None,
+              'diffusion_method':None,
+              'field_decay':None,
+              'matrix_size':None,
+              'display_size':None,
+              'field_dtype':None,
+              'field_path':None,
+              'chunk_size':None,
+              'lod_distance':None,
+              'lod_interval':None,
+              'seed':None,
+              'mutation_rate':None}
     try:
         config_file = open('config.ini')
         cfg_setting = [line.strip().split(' ',1) for line in config_file
@@ -72,7 +95,57 @@ def program_options():
                       help="-e bacterium:paramecium:amoeba:ciliate")
     parser.add_option("-g", dest="display_gamma", action="store",
                       help="-g value (value: 0.5 to 3.0)")
-    (options, args) = parser.parse_args()
+    parser.add_option("--headless", dest="headless", action="store_true",
+                      help="--headless (simulation without display)")
+    parser.add_option("-t", dest="ticks", action="store",
+                      help="-t value (headless simulation ticks)")
+    parser.add_option("-r", dest="tick_ratio", action="store",
+                      help="-r value (simulation ticks per frame, or max)")
+    parser.add_option("-f", dest="frame_rate", action="store",
+                      help="-f value (display frames per second)")
+    parser.add_option("-b", dest="bacterium_engine", action="store",
+                      help="-b sprite|array (bacterium population engine)")
+    parser.add_option("-p", dest="paramecium_engine", action="store",
+                      help="-p sprite|array (paramecium population engine)")
+    parser.add_option("-a", dest="rotation_step", action="store",
+                      help="-a value (sprite rotation resolution in degrees)")
+    parser.add_option("-c", dest="field_color", action="store",
+                      help="-c raw|green|heat|grey (field colour scheme)")
+    parser.add_option("--trace-decay", dest="trace_decay", action="store",
+                      help="--trace-decay value (ticks to decay trace field)")
+    parser.add_option("--trace-thread", dest="trace_thread",
+                      action="store_true",
+                      help="--trace-thread (trace decay in thread)")
+    parser.add_option("--diffusion", dest="diffusion", action="store",
+                      help="--diffusion value (field diffusion rate per tick)")
+    parser.add_option("--diffusion-interval", dest="diffusion_interval",
+                      action="store",
+                      help="--diffusion-interval value (ticks between diffusion)")
+    parser.add_option("--diffusion-method", dest="diffusion_method",
+                      action="store",
+                      help="--diffusion-method stencil|fft (diffusion method)")
+    parser.add_option("--field-decay", dest="field_decay", action="store",
+                      help="--field-decay value (field fraction lost per tick)")
+    parser.add_option("--matrix-size", dest="matrix_size", action="store",
+                      help="--matrix-size XxY (matrix dimension)")
+    parser.add_option("--display-size", dest="display_size", action="store",
+                      help="--display-size XxY (display dimension)")
+    parser.add_option("--field-dtype", dest="field_dtype", action="store",
+                      help="--field-dtype int32|uint16|float32 (field type)")
+    parser.add_option("--field-path", dest="field_path", action="store",
+                      help="--field-path path (memory mapped field files)")
+    parser.add_option("--chunk-size", dest="chunk_size", action="store",
+                      help="--chunk-size value (world chunk size, 0 for none)")
+    parser.add_option("--lod-distance", dest="lod_distance", action="store",
+                      help="--lod-distance value (chunks from view at full update)")
+    parser.add_option("--lod-interval", dest="lod_interval", action="store",
+                      help="--lod-interval value (ticks between far chunk update)")
+    parser.add_option("--seed", dest="seed", action="store",
+                      help="--seed value (random seed for reproducible run)")
+    parser.add_option("--mutation-rate", dest="mutation_rate",
+                      action="store",
+                      help="--mutation-rate value (evolution mutation rate)")
+    (options, args) = parser.parse_args(arguments)
     if options.doc:
         try:
             docfile = open('README.txt')
@@ -100,6 +173,33 @@ def program_options():
         config['species_evolving'] = options.species_evolving
     if options.display_gamma:
         config['display_gamma'] = options.display_gamma
+    if options.headless:
+        config['headless'] = 'true'
+    if options.ticks:
+        config['ticks'] = options.ticks
+    if options.tick_ratio:
+        config['tick_ratio'] = options.tick_ratio
+    if options.frame_rate:
+        config['frame_rate'] = options.frame_rate
+    if options.bacterium_engine:
+        config['bacterium_engine'] = options.bacterium_engine
+    if options.paramecium_engine:
+        config['paramecium_engine'] = options.paramecium_engine
+    if options.rotation_step:
+        config['rotation_step'] = options.rotation_step
+    if options.field_color:
+        config['field_color'] = options.field_color
+    if options.trace_decay:
+        config['trace_decay'] = options.trace_decay
+    if options.trace_thread:
+        config['trace_thread'] = 'true'
+    for option in ('diffusion', 'diffusion_interval', 'diffusion_method',
+                   'field_decay', 'matrix_size', 'display_size',
+                   'field_dtype', 'field_path', 'chunk_size',
+                   'lod_distance', 'lod_interval', 'seed',
+                   'mutation_rate'):
+        if getattr(options, option):
+            config[option] = getattr(options, option)
     if config['species_added']:
         config['species_added'] = (
             config['species_added'].lower().split(':'))
@@ -115,10 +215,96 @@ def program_options():
             config['display_gamma'] = float(config['display_gamma'])
         except ValueError:
             config['display_gamma'] = None
+    if config['headless']:
+        config['headless'] = (
+            config['headless'].lower() in ('true', 'yes', 'on', '1'))
+    if config['ticks']:
+        try:
+            config['ticks'] = int(config['ticks'])
+        except ValueError:
+            config['ticks'] = None
+    if config['tick_ratio']:
+        if config['tick_ratio'].lower() == 'max':
+            config['tick_ratio'] = 0    #as fast as possible
+        else:
+            try:
+                config['tick_ratio'] = max(int(config['tick_ratio']), 1)
+            except ValueError:
+                config['tick_ratio'] = None
+    if config['tick_ratio'] is None:
+        config['tick_ratio'] = 1
+    if config['frame_rate']:
+        try:
+            config['frame_rate'] = max(int(config['frame_rate']), 1)
+        except ValueError:
+            config['frame_rate'] = None
+    if not config['frame_rate']:
+        config['frame_rate'] = 40
+    for engine in ('bacterium_engine', 'paramecium_engine'):
+        if config[engine]:
+            config[engine] = config[engine].lower()
+            if config[engine] not in ('sprite', 'array'):
+                config[engine] = None
+    if config['rotation_step']:
+        try:
+            config['rotation_step'] = min(max(int(config['rotation_step']),
+                                              1), 90)
+        except ValueError:
+            config['rotation_step'] = None
+    if config['field_color']:
+        config['field_color'] = config['field_color'].lower()
+        if config['field_color'] not in ('raw', 'green', 'heat', 'grey'):
+            config['field_color'] = None
+    if config['trace_decay']:
+        try:
+            config['trace_decay'] = max(int(config['trace_decay']), 1)
+        except ValueError:
+            config['trace_decay'] = None
+    if config['trace_thread']:
+        config['trace_thread'] = (
+            config['trace_thread'].lower() in ('true', 'yes', 'on', '1'))
+    for option in ('diffusion', 'field_decay', 'mutation_rate'):
+        if config[option]:
+            try:
+                config[option] = min(max(float(config[option]), 0.0), 1.0)
+            except ValueError:
+                config[option] = None
+    if config['diffusion_interval']:
+        try:
+            config['diffusion_interval'] = max(
+                int(config['diffusion_interval']), 1)
+        except ValueError:
+            config['diffusion_interval'] = None
+    if config['diffusion_method']:
+        config['diffusion_method'] = config['diffusion_method'].lower()
+        if config['diffusion_method'] not in ('stencil', 'fft'):
+            config['diffusion_method'] = None
+    for option in ('matrix_size', 'display_size'):
+        if config[option]:
+            try:
+                size = config[option].lower().split('x')
+                config[option] = (int(size[0]), int(size[1]))
+            except (ValueError, IndexError):
+                config[option] = None
+    for option in ('chunk_size', 'lod_distance', 'lod_interval'):
+        if config[option]:
+            try:
+                config[option] = max(int(config[option]), 0)
+            except ValueError:
+                config[option] = None
+    if config['seed']:
+        try:
+            config['seed'] = int(config['seed'])
+        except ValueError:
+            config['seed'] = None
+    if config['field_dtype']:
+        config['field_dtype'] = config['field_dtype'].lower()
+        if config['field_dtype'] not in ('int32', 'uint16', 'float32'):
+            config['field_dtype'] = None
     return config
 
 
-def setup():
+def setup(config=None):
     species = {'algae': True,
                'bacterium': True,
                'paramecium': True,
@@ -129,7 +315,8 @@ def setup():
                      'paramecium': Paramecium,
                      'amoeba': Amoeba,
                      'ciliate': Ciliate}
-    config = program_options()
+    if config is None:
+        config = program_options()
     if config['display_gamma']:
         gamma = config['display_gamma']
         if gamma > 0.0 and gamma < 0.5:
@@ -142,10 +329,34 @@ def setup():
         for sp in species:
             if sp not in config['species_added']:
                 species[sp] = False
+    display_size = config['display_size'] or (500,500)
+    display_size = (max(display_size[0],300), max(display_size[1],300))
+    matrix_size = config['matrix_size'] or (1500,1500)
+    matrix_size = (max(matrix_size[0],display_size[0]),
+                   max(matrix_size[1],display_size[1]))   #matrix at least display size
     parameters = {}
-    parameters['matrix_size'] = (1500,1500)
-    parameters['display_size'] = (500,500)
+    parameters['matrix_size'] = matrix_size
+    parameters['display_size'] = display_size
     parameters['gamma'] = gamma
+    parameters['headless'] = bool(config['headless'])
+    parameters['bacterium_engine'] = config['bacterium_engine'] or 'sprite'
+    parameters['paramecium_engine'] = config['paramecium_engine'] or 'sprite'
+    parameters['rotation_step'] = config['rotation_step']
+    parameters['field_color'] = config['field_color'] or 'raw'
+    parameters['trace_decay'] = config['trace_decay']
+    parameters['trace_thread'] = bool(config['trace_thread'])
+    parameters['diffusion'] = config['diffusion']
+    parameters['diffusion_interval'] = config['diffusion_interval']
+    parameters['diffusion_method'] = config['diffusion_method']
+    parameters['field_decay'] = config['field_decay']
+    parameters['field_dtype'] = config['field_dtype'] or 'int32'
+    parameters['field_path'] = config['field_path']
+    parameters['chunk_size'] = config['chunk_size']
+    parameters['lod_distance'] = config['lod_distance']
+    parameters['lod_interval'] = config['lod_interval']
+    parameters['seed'] = config['seed']
+    if config['mutation_rate'] is not None:
+        parameters['mutation_rate'] = config['mutation_rate']
     matrix = Matrix(parameters)
     matrix.setup(algae=species['algae'],
                  bacterium=species['bacterium'],
@@ -158,19 +369,58 @@ def setup():
                     species_class[sp].gene):
                 species_class[sp].evolving = True
                 matrix.set_evolution(True)
-    control = Control(matrix)
+    if not matrix.headless:
+        control = Control(matrix, frame_rate=config['frame_rate'])
+    else:
+        control = None
     return matrix, control
 
 
+def headless(matrix, ticks=None):
+    "Run simulation without display, for ticks or until interrupted."
+    tick = 0
+    try:
+        while ticks is None or tick < ticks:
+            matrix.step()
+            tick += 1
+    except KeyboardInterrupt:
+        pass
+    return tick
+
+
+def fast_forward(matrix, duration):
+    "Step simulation for duration in seconds, return ticks run."
+    tick = 0
+    start = time.time()
+    while time.time() - start < duration:
+        matrix.step()
+        tick += 1
+    return tick
+
+
 def main():
-    matrix, control = setup()
+    config = program_options()
+    matrix, control = setup(config)
+    if matrix.headless:
+        headless(matrix, config['ticks'])
+        matrix.trace_decay.stop()   #join decay thread before flush
+        matrix.field_flush()
+        return
+    tick_ratio = config['tick_ratio']
+    frame_time = 1.0 / control.frame_rate
     while not control.quit:
-        if control.clock.get_fps() > 20:
+        if control.clock.get_fps() > control.frame_rate // 2:
             pygame.display.update(matrix.update_list)
         else:
             pygame.display.flip()
-        matrix.update()
+        if tick_ratio:
+            matrix.update(tick_ratio)
+        else:   #simulate for frame duration, then display
+            fast_forward(matrix, frame_time)
+            matrix.update(0)
         control.update()
+    matrix.trace_decay.stop()
+    matrix.field_flush()
 
 
 if __name__ == '__main__':
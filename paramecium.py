@@ -6,8 +6,11 @@ Copyright (C) 2009 James Garnon
 from __future__ import division
 import pygame
 import pygame.bufferproxy
-import random
+import numpy
+import operator
+import itertools
 from cell import Cell
+from util import sin_table, cos_table
 
 
 class Paramecium(Cell):
@@ -15,6 +18,7 @@ class Paramecium(Cell):
     Paramecium species.
     """
 
+    __slots__ = ('prey_success', 'step')
     image = None
     count = 0
     id = 0
@@ -67,13 +71,14 @@ class Paramecium(Cell):
 
     def set_trait(self, gene):
         #gene = 1:vel_sense_f, 2:vel_sense_r, 3:dist_sense_f-0, 4:dist_sense_f-1, 5:dist_sense_r-0, 6:dist_sense_r-1, 7:dist-0, 8:dist-1, 9:dist_i-0, 10:dist_i-1, 11:dir_f-0, 12:dir_f-1
+        draw = self.matrix.random_draw
         trait = {'vel_sense_f': gene[1],
                  'vel_sense_r': gene[2],
-                 'dist_sense_f': lambda: (1 * random.choice((gene[3],gene[4]))),
-                 'dist_sense_r': lambda: (3 * random.choice((gene[5],gene[6]))),
-                 'dist': lambda: random.randrange(gene[7],gene[8]),
-                 'dir_i': lambda: random.randrange(gene[9],gene[10]),
-                 'dir_f': lambda: random.randrange(gene[11],gene[12])}
+                 'dist_sense_f': draw.choice((gene[3],gene[4]), scale=1),
+                 'dist_sense_r': draw.choice((gene[5],gene[6]), scale=3),
+                 'dist': draw.randrange(gene[7],gene[8]),
+                 'dir_i': draw.randrange(gene[9],gene[10]),
+                 'dir_f': draw.randrange(gene[11],gene[12])}
         return trait
 
     def evolve(self):
@@ -108,17 +113,17 @@ class Paramecium(Cell):
         return sense
 
     def check_interact_members(self):      #interact with other paramecium
-        paramecium_bump = pygame.sprite.spritecollide(
-            self, self.matrix.cells['paramecium'], False)  #paramecium avoidance
+        paramecium_bump = self.matrix.creature_collide(
+            self, 'paramecium')  #paramecium avoidance
         if len(paramecium_bump) > 1:    #bumping more than self
             for bump in paramecium_bump:    #if not reverse?
                 if bump == self:
                     continue
                 elif (abs(bump.rect.centerx-self.rect.centerx) < 25 and
                       abs(bump.rect.centery-self.rect.centery) < 25):
-                    if not self.interact or (random.random() > 0.99):
+                    if not self.interact or (self.matrix.random.random() > 0.99):
                         self.step = 0   #?
-                        self.interact = random.randrange(-3,4)
+                        self.interact = self.matrix.random.randrange(-3,4)
         else:
             self.interact = 0   #not bumping
         if self.interact:
@@ -128,15 +133,15 @@ class Paramecium(Cell):
 
     def check_interact(self):
         self.check_interact_members()
-        if (self.check_edge(self.image.get_width()//2,
-            self.image.get_height()//2) or
+        if (self.check_edge(self.rect.width//2,
+            self.rect.height//2) or
                 self.check_bump_map((self.x,self.y))):
             self.motion_reverse()
 
     def check_bump_map(self, position):
         try:
             if (self.matrix.nutrient[position] > 10000 and
-                    random.random() > 0.9):   #check if contacting nutrient peak
+                    self.matrix.random.random() > 0.9):   #check if contacting nutrient peak
                 nutrient_bump = True    #increase bump chance?
             else:
                 nutrient_bump = False
@@ -146,9 +151,9 @@ class Paramecium(Cell):
 
     def motion_reverse(self):
         if self.reverse != True:    #reverse again
-            self.distance = random.randrange(40,60)
+            self.distance = self.matrix.random.randrange(40,60)
         else:
-            self.distance = random.randrange(0,60)
+            self.distance = self.matrix.random.randrange(0,60)
         self.velocity *= -1
         self.direction_adj_f = 0
         self.reverse = True
@@ -166,20 +171,20 @@ class Paramecium(Cell):
                 self.velocity = self.trait['vel_sense_r']       #evolve = 2
             elif sense == 3:     #toxin
                 self.velocity = self.trait['vel_sense_f']   #evolve = 3
-                self.direction_adj_f = random.randrange(135,180)
+                self.direction_adj_f = self.matrix.random.randrange(135,180)
         if self.distance <= 0:
             if self.reverse:
                 self.velocity = 2
-                self.direction_adj_i = random.choice((-3,3))
-                self.direction_adj_f = random.randrange(90,135)     #different for bumping nutrient?
-                self.distance = random.randrange(50,75)
+                self.direction_adj_i = self.matrix.random.choice((-3,3))
+                self.direction_adj_f = self.matrix.random.randrange(90,135)     #different for bumping nutrient?
+                self.distance = self.matrix.random.randrange(50,75)
                 self.reverse = False
                 self.reverse_redux = True
             else:
                 self.distance = self.trait['dist']()  #evolve = random.randrange(50,100)
                 self.direction_adj_i = self.trait['dir_i']() #evolve = random.randrange(-2,3)
                 self.direction_adj_f = self.trait['dir_f']() #evolve = random.randrange((45,90))
-                self.velocity = random.choice((2,2))
+                self.velocity = self.matrix.random.choice((2,2))
         if self.direction_adj_f > 0:
             self.rotate_image = True
             self.direction = self.direction_set(
@@ -187,12 +192,17 @@ class Paramecium(Cell):
             self.direction_adj_f -= self.direction_adj_i
         self.distance -= 1
 
+    def move(self):
+        if not self.matrix.paramecium_kernel:     #else motion batched
+            self.motion()
+        self.locate()
+
     def growth(self):
         prey_collide = []
-        prey_collide.extend(pygame.sprite.spritecollide(
-            self, self.matrix.cells['bacterium'], False))
-        prey_collide.extend(pygame.sprite.spritecollide(
-            self, self.matrix.cells['algae'], False))
+        prey_collide.extend(self.matrix.creature_collide(
+            self, 'bacterium'))
+        prey_collide.extend(self.matrix.creature_collide(
+            self, 'algae'))
         for prey in prey_collide:
             if (abs(prey.rect.centerx - self.rect.centerx) <
                     self.prey_success and
@@ -205,3 +215,135 @@ class Paramecium(Cell):
         self.move()
         self.growth()
 
+
+
+class ParameciumKernel(object):
+    """
+    Batched Paramecium.motion for all paramecia and ciliates, with
+    sensing, trait draws and direction updates evaluated as arrays
+    from gene of each individual.
+    """
+
+    state = operator.attrgetter('pos_x', 'pos_y', 'x', 'y', 'direction',
+                                'distance', 'velocity', 'direction_adj_i',
+                                'direction_adj_f', 'reverse',
+                                'reverse_redux')
+    genes = operator.itemgetter(*range(1,13))
+
+    def __init__(self, matrix):
+        self.matrix = matrix
+        self.sin = numpy.array([sin_table[angle] for angle in range(360)])
+        self.cos = numpy.array([cos_table[angle] for angle in range(360)])
+
+    def randrange(self, start, stop):
+        rng = self.matrix.random_array
+        return start + (rng.random_sample(len(start))
+                        * (stop-start)).astype('i')
+
+    def choice(self, first, second):
+        rng = self.matrix.random_array
+        return numpy.where(rng.random_sample(len(first)) < 0.5,
+                           first, second)
+
+    def probe(self, field, x, y, valid):
+        "Field values at x,y, where valid otherwise 0."
+        return numpy.where(valid,
+                           field[numpy.minimum(x, self.matrix.x-1),
+                                 numpy.minimum(y, self.matrix.y-1)], 0)
+
+    def sense(self, pos_x, pos_y, x, y, direction):
+        "Paramecium.sense of each paramecium."
+        matrix = self.matrix
+        lead_x = (pos_x + 25*self.sin[direction]).astype('i')   #int() truncation as locate_coordinate
+        lead_y = (pos_y - 25*self.cos[direction]).astype('i')
+        reverse_direction = (direction + 180) % 360
+        back_x = (pos_x + 25*self.sin[reverse_direction]).astype('i')
+        back_y = (pos_y - 25*self.cos[reverse_direction]).astype('i')
+        lead = (lead_x < matrix.x) & (lead_y < matrix.y)   #not sense if past edge
+        back = lead & (back_x < matrix.x) & (back_y < matrix.y)
+        nutrient = matrix.nutrient[x,y]
+        trace = matrix.trace[x,y]
+        if matrix.toxin_presense:
+            toxin = (self.probe(matrix.toxin, lead_x, lead_y, lead) >
+                     matrix.toxin[x,y]) & lead
+        else:
+            toxin = numpy.zeros(len(x), '?')
+        forward = ((self.probe(matrix.nutrient, lead_x, lead_y, lead) >
+                    nutrient) |
+                   (self.probe(matrix.trace, lead_x, lead_y, lead) >
+                    trace)) & lead & ~toxin
+        backward = ((self.probe(matrix.nutrient, back_x, back_y, back) >
+                     nutrient) |
+                    (self.probe(matrix.trace, back_x, back_y, back) >
+                     trace)) & back & ~toxin & ~forward
+        sense = numpy.zeros(len(x), 'i')
+        sense[forward] = 1
+        sense[backward] = 2
+        sense[toxin] = 3
+        return sense
+
+    def motion(self, paramecia):
+        "Paramecium.motion of each paramecium in list paramecia."
+        rng = self.matrix.random_array
+        if not paramecia:
+            return
+        n = len(paramecia)
+        chain = itertools.chain.from_iterable
+        state = numpy.fromiter(chain(map(self.state, paramecia)), 'd',
+                               n*11).reshape((n,11))
+        gene = numpy.fromiter(chain(self.genes(bug.gene) for bug in paramecia),
+                              'i', n*12).reshape((n,12))
+        (pos_x, pos_y, x, y, direction, distance, velocity,
+         direction_adj_i, direction_adj_f, reverse, reverse_redux) = state.T
+        x = x.astype('i')
+        y = y.astype('i')
+        direction = direction.astype('i')
+        distance = distance.astype('i')
+        velocity = velocity.astype('i')
+        direction_adj_i = direction_adj_i.astype('i')
+        direction_adj_f = direction_adj_f.astype('i')
+        reverse = reverse.astype('?')
+        reverse_redux = reverse_redux.astype('?')
+        sense = self.sense(pos_x, pos_y, x, y, direction)
+        sense[reverse] = 0
+        forward = (sense == 1)
+        distance[forward] += self.choice(gene[:,2], gene[:,3])[forward]   #trait['dist_sense_f']
+        velocity[forward] = gene[:,0][forward]    #trait['vel_sense_f']
+        direction_adj_f[forward & ~reverse_redux] = 0
+        backward = (sense == 2)
+        distance[backward] -= 3 * self.choice(gene[:,4],
+                                              gene[:,5])[backward]   #trait['dist_sense_r']
+        velocity[backward] = gene[:,1][backward]   #trait['vel_sense_r']
+        toxin = (sense == 3)
+        velocity[toxin] = gene[:,0][toxin]
+        direction_adj_f[toxin] = rng.randint(135, 180, len(x))[toxin]
+        travel = (distance <= 0)
+        retreat = travel & reverse
+        velocity[retreat] = 2
+        direction_adj_i[retreat] = numpy.where(
+            rng.random_sample(len(x)) < 0.5, -3, 3)[retreat]
+        direction_adj_f[retreat] = rng.randint(90, 135,
+                                                        len(x))[retreat]
+        distance[retreat] = rng.randint(50, 75, len(x))[retreat]
+        reverse[retreat] = False
+        reverse_redux[retreat] = True
+        advance = travel & ~retreat
+        distance[advance] = self.randrange(gene[:,6], gene[:,7])[advance]  #trait['dist']
+        direction_adj_i[advance] = self.randrange(gene[:,8],
+                                                  gene[:,9])[advance]    #trait['dir_i']
+        direction_adj_f[advance] = self.randrange(gene[:,10],
+                                                  gene[:,11])[advance]   #trait['dir_f']
+        velocity[advance] = 2
+        rotate = (direction_adj_f > 0)
+        direction[rotate] = (direction[rotate] + direction_adj_i[rotate]) % 360
+        direction_adj_f[rotate] -= direction_adj_i[rotate]
+        distance -= 1
+        for bug, value in zip(paramecia, zip(
+                direction.tolist(), distance.tolist(), velocity.tolist(),
+                direction_adj_i.tolist(), direction_adj_f.tolist(),
+                reverse.tolist(), reverse_redux.tolist(), rotate.tolist())):
+            (bug.direction, bug.distance, bug.velocity, bug.direction_adj_i,
+             bug.direction_adj_f, bug.reverse, bug.reverse_redux,
+             rotate_image) = value
+            if rotate_image:
+                bug.rotate_image = True
@@ -0,0 +1,123 @@
+"""
+Microbe - Microbial Simulation
+Copyright (C) 2009 James Garnon
+"""
+
+from __future__ import division
+import pygame
+import numpy
+
+
+class FieldRenderer(object):
+    """
+    Renders nutrient/toxin field and bacterium trace to surface.
+    Colour scheme raw displays field values as pixel values, other
+    schemes map field through a palette lookup table. Buffers are
+    preallocated to display size, and results written in place.
+    """
+
+    schemes = {'raw': None,
+               'green': ((0,0,0), (0,90,30), (60,200,80), (220,255,200)),
+               'heat': ((0,0,0), (120,20,0), (230,120,0), (255,255,180)),
+               'grey': ((0,0,0), (80,80,80), (170,170,170), (255,255,255))}
+    toxin_scheme = {'raw': None,
+                    'green': ((0,0,0), (90,0,40), (220,40,60)),
+                    'heat': ((0,0,0), (0,30,120), (60,140,255)),
+                    'grey': ((0,0,0), (40,0,60), (120,40,160))}
+
+    def __init__(self, surface, size, scheme='raw',
+                 field_max=10000000, toxin_threshold=10000):
+        self.size = size
+        self.toxin_threshold = toxin_threshold
+        self.field = numpy.zeros(size, 'i')     #field value buffer
+        self.toxin = numpy.zeros(size, 'i')
+        self.toxin_mask = numpy.zeros(size, bool)
+        self.level = numpy.zeros(size, 'f')     #palette level buffer
+        self.index = numpy.zeros(size, 'i')
+        self.scale = 255 / numpy.log1p(field_max)
+        self.set_scheme(scheme, surface)
+
+    def set_scheme(self, scheme, surface):
+        "Set colour scheme, with palette mapped to surface format."
+        if scheme not in self.schemes:
+            scheme = 'raw'
+        self.scheme = scheme
+        if scheme == 'raw':
+            self.palette = None
+            self.trace_palette = numpy.arange(256, dtype='i')   #value as pixel
+        else:
+            colors = numpy.concatenate(
+                (self.gradient(self.toxin_scheme[scheme])[::-1],
+                 self.gradient(self.schemes[scheme])[1:]))  #toxin, zero, nutrient levels
+            self.palette = pygame.surfarray.map_array(
+                surface, colors).astype('i')
+            self.trace_palette = self.palette[255:]
+
+    def gradient(self, colors):
+        "Return 256 colour levels interpolated between colors."
+        colors = numpy.array(colors, 'f')
+        position = numpy.linspace(0, len(colors)-1, 256)
+        level = numpy.empty((256,3), 'f')
+        for channel in range(3):
+            level[:,channel] = numpy.interp(position,
+                                            range(len(colors)),
+                                            colors[:,channel])
+        return level.astype('i')
+
+    def render(self, surface, rect, nutrient, toxin=None):
+        "Render field to surface rect, with toxin subtracted above threshold."
+        width, height = rect.size
+        field = self.field[:width,:height]
+        if toxin is not None:
+            toxin_mask = self.toxin_mask[:width,:height]
+            numpy.greater(toxin, self.toxin_threshold, out=toxin_mask)
+            numpy.multiply(toxin, toxin_mask, out=self.toxin[:width,:height],
+                           casting='unsafe')
+            numpy.subtract(nutrient, self.toxin[:width,:height], out=field,
+                           casting='unsafe')
+        else:
+            field = nutrient
+        try:
+            pixels = pygame.surfarray.pixels2d(surface)
+        except ValueError:  #24-bit surface
+            pixels = None
+        if pixels is not None:
+            view = pixels[rect.left:rect.right,rect.top:rect.bottom]
+            self.map(field, view)
+            del view, pixels    #unlock surface
+        else:
+            view = numpy.zeros((width,height), 'i')
+            self.map(field, view)
+            pygame.surfarray.blit_array(surface.subsurface(rect), view)
+
+    def map(self, field, pixels):
+        "Map field values into pixels."
+        if self.palette is None:
+            numpy.copyto(pixels, field, casting='unsafe')
+            return
+        if self.palette.dtype != pixels.dtype:
+            self.palette = self.palette.astype(pixels.dtype)
+        width, height = field.shape
+        level = self.level[:width,:height]
+        index = self.index[:width,:height]
+        numpy.absolute(field, out=level)
+        numpy.log1p(level, out=level)
+        numpy.multiply(level, self.scale, out=level)
+        numpy.copysign(level, field, out=level)     #toxin below zero level
+        numpy.add(level, 255, out=level)
+        numpy.copyto(index, level, casting='unsafe')
+        numpy.take(self.palette, index, out=pixels, mode='clip')
+
+    def render_trace(self, surface, trace):
+        "Render trace to surface through trace palette."
+        try:
+            pixels = pygame.surfarray.pixels2d(surface)
+        except ValueError:
+            view = numpy.take(self.trace_palette, trace)
+            pygame.surfarray.blit_array(surface, view)
+            return
+        if self.trace_palette.dtype != pixels.dtype:
+            self.trace_palette = self.trace_palette.astype(pixels.dtype)
+        view = pixels[:trace.shape[0],:trace.shape[1]]
+        numpy.take(self.trace_palette, trace, out=view, mode='clip')
+        del view, pixels
@@ -0,0 +1,93 @@
+"""
+Microbe - Microbial Simulation
+Copyright (C) 2009 James Garnon
+"""
+
+from __future__ import division
+import math
+
+
+class SpatialGrid(object):
+    """
+    Uniform spatial hash of sprites bucketed by rect center.
+    Rebuilt each tick, so query is widened by slack to cover
+    movement since the build. Sprites born during the tick are
+    inserted at once, as in the group spritecollide searched.
+    """
+
+    def __init__(self, cell_size=50, slack=10):
+        self.cell_size = cell_size
+        self.slack = slack
+        self.buckets = {}
+        self.margin = slack     #max sprite half size and slack
+
+    def build(self, sprites):
+        size = self.cell_size
+        buckets = {}
+        extent = 0
+        for sprite in sprites:
+            rect = sprite.rect
+            key = (rect.centerx//size, rect.centery//size)
+            try:
+                buckets[key].append(sprite)
+            except KeyError:
+                buckets[key] = [sprite]
+            diagonal = rect.width*rect.width + rect.height*rect.height
+            if diagonal > extent:
+                extent = diagonal
+        self.buckets = buckets
+        self.margin = int(math.sqrt(extent)//2) + 1 + self.slack     #rect size bound by rotation
+
+    def insert(self, sprite):
+        "Add sprite to bucket of rect center, in query until next build."
+        size = self.cell_size
+        rect = sprite.rect
+        key = (rect.centerx//size, rect.centery//size)
+        try:
+            self.buckets[key].append(sprite)
+        except KeyError:
+            self.buckets[key] = [sprite]
+        margin = int(math.sqrt(rect.width*rect.width +
+                               rect.height*rect.height)//2) + 1 + self.slack    #rect size bound by rotation
+        if margin > self.margin:
+            self.margin = margin
+
+    def collide(self, sprite):
+        """
+        Return sprites with rect colliding with sprite rect,
+        equivalent to pygame.sprite.spritecollide.
+        """
+        size = self.cell_size
+        margin = self.margin
+        rect = sprite.rect
+        buckets = self.buckets
+        x1 = (rect.left-margin)//size
+        x2 = (rect.right+margin)//size
+        y1 = (rect.top-margin)//size
+        y2 = (rect.bottom+margin)//size
+        collided = []
+        for i in range(x1, x2+1):
+            for j in range(y1, y2+1):
+                if (i,j) in buckets:
+                    for neighbour in buckets[(i,j)]:
+                        if rect.colliderect(neighbour.rect):
+                            collided.append(neighbour)
+        return collided
+
+    def within(self, left, top, right, bottom):
+        """
+        Return sprites with rect center within bounds, exclusive,
+        including sprites moved up to slack since the build.
+        """
+        size = self.cell_size
+        slack = self.slack
+        buckets = self.buckets
+        within = []
+        for i in range((left-slack)//size, (right+slack)//size+1):
+            for j in range((top-slack)//size, (bottom+slack)//size+1):
+                if (i,j) in buckets:
+                    for sprite in buckets[(i,j)]:
+                        x, y = sprite.rect.center
+                        if left < x < right and top < y < bottom:
+                            within.append(sprite)
+        return within
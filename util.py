@@ -10,7 +10,7 @@ import math
 
 
 def load_image(file_name, frames=1, path='data',
-               colorkey=None, errorhandle=True):
+               colorkey=None, errorhandle=True, convert=True):
     full_name = os.path.join(path, file_name)
     try:
         if frames == 1:
@@ -32,6 +32,8 @@ def load_image(file_name, frames=1, path='data',
         else:
             print("Error loading image %s" % file_name)
             return None
+    if not convert:     #no display mode set, when headless
+        return image
     if image.get_alpha():
         image = image.convert_alpha()
     else:
@@ -43,6 +45,63 @@ def load_image(file_name, frames=1, path='data',
     return image
 
 
+class Rotation(object):
+    """
+    Pre-rotated images of species frames, at angular resolution step.
+    """
+
+    step = 4    #default angular resolution in degrees
+
+    def __init__(self, images, step=None, name=None):
+        if step is None:
+            step = Rotation.step
+        self.step = step
+        self.name = name    #image file of species
+        self.source = images
+        self.count = max(int(round(360 / step)), 1)
+        self.images = [[pygame.transform.rotozoom(
+                            image, -(index * 360 / self.count), 1.0)
+                        for index in range(self.count)]
+                       for image in images]
+
+    def image(self, frame, direction):
+        "Return frame image rotated to nearest direction."
+        index = int(direction * self.count / 360 + 0.5) % self.count
+        return self.images[frame][index]
+
+
+rotations = {}  #rotation cache shared by species with same image
+
+
+def get_rotation(cell_image, images, step=None):
+    if step is None:
+        step = Rotation.step
+    key = (cell_image, len(images), step)
+    if key not in rotations:
+        rotations[key] = Rotation(images, step, cell_image)
+    return rotations[key]
+
+
+rotated_sizes = {}  #rotated image size by image size and rotation index
+
+
+def rotated_size(size, direction, step=None):
+    "Return size of image of size rotated to direction, as Rotation image."
+    if step is None:
+        step = Rotation.step
+    count = max(int(round(360 / step)), 1)
+    index = int(direction * count / 360 + 0.5) % count
+    key = (size, count, index)
+    try:
+        return rotated_sizes[key]
+    except KeyError:
+        rotated = pygame.transform.rotozoom(pygame.Surface(size),
+                                            -(index * 360 / count),
+                                            1.0).get_size()
+        rotated_sizes[key] = rotated
+        return rotated
+
+
 def trig_compute():
     sin_table = {}
     cos_table = {}
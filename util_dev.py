@@ -1,5 +1,6 @@
 from __future__ import division
 import pygame
+import time
 
 
 diag_message = []
@@ -58,3 +59,123 @@ def profile():
             print(message)
     sys.exit()
 
+
+
+def memory_rss():
+    "Return resident memory in kB, or None if unavailable."
+    try:
+        statm = open('/proc/self/statm')
+        rss = int(statm.read().split()[1])
+        statm.close()
+        import resource
+        return rss * resource.getpagesize() // 1024
+    except (IOError, ImportError, ValueError):
+        try:
+            import resource
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        except ImportError:
+            return None
+
+
+def creature_clear(matrix, group):
+    "Remove creatures of group, and from spatial index as at matrix step."
+    for bug in group.sprites():
+        bug.life = False
+        bug.life_check()
+        group.remove(bug)
+    matrix.group_grid[group].build(group)
+
+
+def creation_heap(matrix, species_class, group):
+    """
+    Return Python heap in bytes per creature of group recreated to
+    maximum population, or None if tracemalloc unavailable.
+    """
+    try:
+        import tracemalloc
+    except ImportError:
+        return None
+    import gc
+    creature_clear(matrix, group)
+    gc.collect()
+    tracemalloc.start()
+    while species_class.count < species_class.maximum:
+        matrix.add_creature(species_class)
+    heap = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return heap // len(group)
+
+
+def creation_benchmark(species='Bacterium', population=None, repeat=5):
+    """
+    Report creature creation rate and memory at maximum population,
+    on a headless matrix with creatures of species removed and
+    recreated repeat times. Population sets species maximum.
+    Memory per creature is Python heap of the population, traced
+    separately from timing, and includes the instance dict and group
+    set that pygame Sprite gives each creature alongside its slots.
+    RSS growth also counts allocator and interpreter overhead.
+    """
+    from microbe import setup, program_options
+    config = program_options()
+    config['headless'] = True
+    config['species_added'] = ['none']
+    matrix = setup(config)[0]
+    species_class = dict((sp.__name__, sp) for sp in matrix.species)[species]
+    group = matrix.cells[species.lower()]
+    matrix.add_creature(species_class)  #species initiated on first
+    if population:
+        species_class.maximum = population
+    rss_start = memory_rss()
+    creation = 0.0
+    created = 0
+    for cycle in range(repeat):
+        creature_clear(matrix, group)
+        time_start = time.time()
+        while species_class.count < species_class.maximum:
+            matrix.add_creature(species_class)
+        creation += time.time() - time_start
+        created += len(group)
+    rss_end = memory_rss()
+    print("%s maximum population: %d" % (species, len(group)))
+    print("creation rate: %d/s" % (created / creation))
+    print("time per creature: %0.1f us" % (creation / created * 1e6))
+    heap = creation_heap(matrix, species_class, group)
+    if heap is not None:
+        print("Python heap at maximum population: %d B/creature" % heap)
+    if rss_start is not None:
+        print("RSS at maximum population: %d kB (+%d kB, %d B/creature)" %
+              (rss_end, rss_end-rss_start,
+               (rss_end-rss_start) * 1024 // len(group)))
+
+
+def diffusion_benchmark(sizes=((1500,1500), (3000,3000)), rate=0.05,
+                        interval=10, repeat=5):
+    """
+    Report field diffusion cost per pass and per tick amortized over
+    interval, for stencil and fft methods at matrix sizes.
+    """
+    import numpy
+    from diffusion import FieldDiffusion
+
+    class Field(object):
+        def field_array(self, name, dtype):
+            return numpy.zeros((self.x,self.y), dtype)
+
+    for size in sizes:
+        field = Field()
+        field.x, field.y = size
+        field.nutrient = numpy.random.randint(0, 1000000, size).astype('i')
+        field.toxin_presense = False
+        field.field_dirty = numpy.zeros((1,1), bool)
+        field.field_limit = None
+        field.chunks = None
+        for method in ('stencil', 'fft'):
+            diffusion = FieldDiffusion(field, rate, interval, method=method)
+            time_start = time.time()
+            for cycle in range(repeat):
+                diffusion.diffuse(field.nutrient)
+            duration = (time.time() - time_start) / repeat
+            print("%dx%d %s: %0.1f ms/pass, %0.2f ms/tick" %
+                  (size[0], size[1], method, duration*1000,
+                   duration*1000/interval))